@@ -9,6 +9,8 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from email.mime.text import MIMEText
 import smtplib
 import dateutil.parser
+from app.services.reconciler import poll_delay, CALL_MAX_DURATION, RECONCILE_SLACK
+from app.services.recordings import download_recording
 
 # Load environment variables
 load_dotenv()
@@ -67,9 +69,11 @@ if not call_id:
 print(f"✅ Call initiated. Call ID: {call_id}")
 
 # Polling for call completion
+# Same schedule as the server's reconciler: poll often while the call is young,
+# back off as it ages, and give up once it outlives its max_duration
 call_status = "unknown"
-max_wait_time = 180  # seconds
-poll_interval = 5
+max_wait_time = CALL_MAX_DURATION + RECONCILE_SLACK  # seconds
+started = time.monotonic()
 elapsed = 0
 
 while elapsed < max_wait_time:
@@ -85,8 +89,8 @@ while elapsed < max_wait_time:
     else:
         print("⚠️ Failed to fetch call details. Retrying...")
 
-    time.sleep(poll_interval)
-    elapsed += poll_interval
+    time.sleep(poll_delay(elapsed))
+    elapsed = int(time.monotonic() - started)
 else:
     print("❌ Timed out waiting for call to complete.")
     exit()
@@ -189,11 +193,9 @@ print(f"📁 Call details saved to {filename}")
 # Download recording if available
 recording_url = details.get("recording_url")
 if recording_url:
-    audio = requests.get(recording_url)
-    if audio.status_code == 200:
-        audio_file = f"call_recording_{call_id}.mp3"
-        with open(audio_file, 'wb') as f:
-            f.write(audio.content)
+    # Streamed to the recordings cache; re-runs skip or resume the download
+    audio_file = download_recording(call_id, recording_url)
+    if audio_file:
         print(f"🎧 Recording saved to {audio_file}")
     else:
         print("⚠️ Failed to download recording.")
@@ -0,0 +1,146 @@
+import os
+import time
+from sqlalchemy import create_engine, MetaData, Table, Column, Index, Integer, Float, Boolean, String, Text, DateTime
+from sqlalchemy.exc import DatabaseError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# SQLite locally; point DATABASE_URL at Postgres in production
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///ai_call.db")
+
+connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+engine = create_engine(DATABASE_URL, pool_pre_ping=True, connect_args=connect_args)
+metadata = MetaData()
+
+# One transcript analysis per call, keyed by the hash of the transcript it was run on
+analyses = Table(
+    "analyses", metadata,
+    Column("call_id", String(64), primary_key=True),
+    Column("transcript_hash", String(64), nullable=False),
+    Column("result", Text, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+)
+
+# Completed calls whose analysis failed, with the transcript to retry it
+# from; the row goes once an analysis is saved, and is kept as "failed" after
+# the last attempt
+analysis_retries = Table(
+    "analysis_retries", metadata,
+    Column("call_id", String(64), primary_key=True),
+    Column("transcript", Text, nullable=False),
+    Column("status", String(16), nullable=False, default="pending"),
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("next_attempt_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+    Index("ix_analysis_retries_status_next", "status", "next_attempt_at"),
+)
+
+# At most one reminder per call: call_id is the primary key, so concurrent
+# workers racing to schedule the same call cannot both insert
+reminders = Table(
+    "reminders", metadata,
+    Column("call_id", String(64), primary_key=True),
+    Column("run_date", DateTime, nullable=False),
+    Column("summary", Text, nullable=False, default=""),
+    Column("repayment_date", String(64), nullable=False),
+    Column("status", String(16), nullable=False, default="scheduled"),
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("claimed_by", String(64)),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+    Index("ix_reminders_status_run_date", "status", "run_date"),
+)
+
+# Bulk upload batches; per-call state lives in `calls`
+batches = Table(
+    "batches", metadata,
+    Column("batch_id", String(64), primary_key=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+    Column("total", Integer, nullable=False, default=0),
+    Column("dispatched", Integer, nullable=False, default=0),
+    Column("failed", Integer, nullable=False, default=0),
+    Column("rejected_count", Integer, nullable=False, default=0),
+    Column("rejected", Text, nullable=False, default="[]"),
+    Column("done", Boolean, nullable=False, default=False),
+    Column("error", Text),
+)
+
+calls = Table(
+    "calls", metadata,
+    Column("call_id", String(64), primary_key=True),
+    Column("batch_id", String(64), index=True),
+    Column("phone", String(32), index=True),
+    Column("name", String(255)),
+    Column("status", String(32), nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False, index=True),
+    Index("ix_calls_batch_status", "batch_id", "status"),
+    Index("ix_calls_status_created", "status", "created_at"),
+)
+
+# Bulk rows waiting to be dialed. Any worker adds an upload's rows; the
+# leader claims them (claimed_by, with a token per claiming pass) and deletes
+# each one as it dials it, so rows survive restarts and leader changes
+dial_queue = Table(
+    "dial_queue", metadata,
+    Column("row_id", String(64), primary_key=True),
+    Column("batch_id", String(64), nullable=False, index=True),
+    Column("request", Text, nullable=False),
+    Column("claimed_by", String(64), index=True),
+    Column("claim", String(64), index=True),
+    Column("created_at", DateTime, nullable=False),
+)
+
+# Token buckets shared by every worker, so a provider quota holds across the
+# deployment; updated_at is a Unix timestamp, so refills are plain arithmetic
+rate_limits = Table(
+    "rate_limits", metadata,
+    Column("name", String(64), primary_key=True),
+    Column("tokens", Float, nullable=False),
+    Column("updated_at", Float, nullable=False),
+)
+
+
+# Leader election between worker processes: one row per role, held by
+# whichever worker last renewed it before expires_at
+leases = Table(
+    "leases", metadata,
+    Column("name", String(64), primary_key=True),
+    Column("holder", String(128), nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+)
+
+
+def upsert(conn, table, rows: list[dict], update_columns: list[str], where=None):
+    """
+    Bulk INSERT ... ON CONFLICT (primary key) DO UPDATE for SQLite and Postgres.
+    Every row must carry the same keys; `where` limits which existing rows change.
+    """
+    if not rows:
+        return
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[col.name for col in table.primary_key.columns],
+        set_={col: stmt.excluded[col] for col in update_columns},
+        where=where,
+    )
+    conn.execute(stmt, rows)
+
+
+def init_db(attempts: int = 3):
+    # Workers starting together race to create the tables; a loser retries
+    # and then finds them in place
+    for attempt in range(attempts):
+        try:
+            metadata.create_all(engine)
+            return
+        except DatabaseError:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(0.5)
@@ -1,31 +1,114 @@
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, UploadFile, File, Request, BackgroundTasks, HTTPException, Depends
+from fastapi.responses import HTMLResponse, StreamingResponse, FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.executors.pool import ThreadPoolExecutor
 from dotenv import load_dotenv
-from datetime import datetime
-import io
-import pandas as pd
-import time
+import os
+import json
+import shutil
+import asyncio
+import logging
+import tempfile
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
 from app.models import CallRequest
-from app.utils import normalize_phone
-from app.services.bland import initiate_call, check_bland_call_status
-from app.services.gemini import analyze_transcript
-from app.services.emailer import send_reminder_email
+from app.scheduler import scheduler
+from app.services.bland import initiate_call, check_bland_call_status, verify_webhook_signature, client as bland_client
+from app.services.dialer import BulkDialer
+from app.services import pipeline, reminders, reminder_planner, preanalysis, payloads, gemini, calling_windows
+from app.services.analysis_cache import get_analysis, retry_status
+from app.services.call_store import store
+from app.services.events import status_stream
+from app.services.reconciler import reconciler
+from app.services.recordings import fetcher as recording_fetcher
+from app.services.supabase_sink import sink as supabase_sink
+from app.services.analysis_queue import analysis_queue
+from app.services.emailer import pool as smtp_pool
+from app.services.telemetry import registry
+from app.services.resilience import providers, CircuitOpenError
+from app.services.leadership import LeaderElection
+from app.db import init_db
 
 # Load .env
 load_dotenv()
 
+# Load inflect and Gemini in the background once the app is serving, instead
+# of on the first call; set to 0 to load them strictly on first use
+WARM_UP_SERVICES = os.getenv("WARM_UP_SERVICES", "1") != "0"
+
+def warm_up():
+    try:
+        payloads.number_words()
+        gemini.get_model()
+    except Exception:
+        logging.exception("Service warm-up failed; services will load on first use")
+
+def get_ingest():
+    # pandas is only needed for uploads. A sync dependency runs in the
+    # threadpool, so the first upload's import doesn't stall the event loop
+    from app.services import ingest
+    return ingest
+
+# Every worker process serves requests; only the elected one runs scheduled
+# jobs, the reconciler and the bulk dialer, so each reminder drain, status poll
+# and queued row happens once
+async def lead():
+    # catch_up may fail (e.g. the database is down); nothing is started before it succeeds
+    await asyncio.to_thread(reminders.catch_up)
+    scheduler.resume()
+    app.state.reconciler = asyncio.create_task(reconciler.run())
+    app.state.dialer = asyncio.create_task(dialer.run())
+
+async def step_down():
+    scheduler.pause()
+    for name in ("reconciler", "dialer"):
+        task = getattr(app.state, name)
+        if task is not None:
+            task.cancel()
+            setattr(app.state, name, None)
+            # The dialer records the calls it is placing before it stops
+            await asyncio.gather(task, return_exceptions=True)
+
+election = LeaderElection("scheduler", on_elected=lead, on_demoted=step_down)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    # Scheduler starts after the tables exist, paused until this worker is elected
+    scheduler.start(paused=True)
+    app.state.reconciler = None
+    app.state.dialer = None
+    election_task = asyncio.create_task(election.run())
+    if supabase_sink is not None:
+        supabase_sink.start()
+    if WARM_UP_SERVICES:
+        app.state.warm_up = asyncio.create_task(asyncio.to_thread(warm_up))
+    yield
+    # Queued rows stay in the store for the next leader to dial
+    await dialer.stop()
+    election_task.cancel()
+    await asyncio.gather(election_task, return_exceptions=True)
+    scheduler.shutdown(wait=False)
+    smtp_pool.close()
+    if supabase_sink is not None:
+        await asyncio.to_thread(supabase_sink.close)
+    await analysis_queue.stop()
+    await bland_client.aclose()
+    await recording_fetcher.aclose()
+
 # FastAPI setup
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# APScheduler
-scheduler = BackgroundScheduler(executors={'default': ThreadPoolExecutor(10)})
-scheduler.start()
+# Bulk dialer (concurrency + rate limits come from BLAND_* env vars)
+dialer = BulkDialer()
+pipeline.call_ended_listeners.append(dialer.call_ended)
+registry.gauge("dialer_active_batches", "Bulk uploads this worker is reading into the dial queue", lambda: len(dialer._tasks))
+registry.gauge("dialer_calls_in_flight", "Bulk calls holding a concurrency slot, being placed or live", lambda: dialer.in_flight)
+registry.gauge("dialer_queued_calls", "Bulk calls waiting for a slot inside their calling window", lambda: len(dialer.ready))
+registry.gauge("dialer_deferred_calls", "Bulk calls waiting for their calling window to open", lambda: len(dialer.waiting))
+registry.gauge("leader", "1 on the worker running the scheduler and reconciler", lambda: int(election.is_leader))
 
 @app.get("/", response_class=HTMLResponse)
 async def index():
@@ -34,60 +117,139 @@ async def index():
 
 @app.post("/start-call/")
 async def start_call(data: CallRequest):
+    call_at = calling_windows.next_call_time(data.phone)
+    if call_at is None:
+        return {"error": f"No calling window configured for {data.phone}'s country; not dialing it"}
+    if call_at > datetime.now(timezone.utc):
+        return {"error": f"Outside calling hours for {data.phone}; calls open at {call_at:%Y-%m-%d %H:%M} UTC"}
     # Fixed: Changed parameter order to match the function signature
-    call_id = initiate_call(data.name, data.phone, data.bank_name, data.voice, data.tone, data.due_amount, data.due_date)
+    try:
+        call_id = await initiate_call(data.name, data.phone, data.bank_name, data.voice, data.tone, data.due_amount, data.due_date)
+    except CircuitOpenError as e:
+        return {"error": f"Bland is unavailable, retry in {e.retry_after:.0f}s"}
     if call_id:
+        await asyncio.to_thread(pipeline.track_call, call_id, data.phone, data.name)
+        reconciler.track(call_id)
         return {"message": f"Initiated call to {data.name}", "call_id": call_id}
     return {"error": "Call initiation failed"}
 
 @app.get("/call-status/{call_id}")
 async def call_status(call_id: str):
-    status, transcript = check_bland_call_status(call_id)
-    if status == "completed" and transcript:
-        gemini_data = analyze_transcript(transcript)
-        repayment_raw = gemini_data.get("repayment_date")
-        if repayment_raw:
-            try:
-                from dateutil import parser
-                dt = parser.parse(repayment_raw, fuzzy=True).replace(hour=9, minute=0)
-                if dt > datetime.now():
-                    scheduler.add_job(send_reminder_email, 'date', run_date=dt, args=[gemini_data["summary"], repayment_raw])
-            except Exception as e:
-                print("❌ Date parse error:", e)
+    # Webhooks and the reconciler keep local state current; Bland is only
+    # polled for calls we know nothing about
+    status = await asyncio.to_thread(pipeline.get_status, call_id)
+    if status is None:
+        status, transcript = await check_bland_call_status(call_id)
+        if status == "error":
+            return {"status": status}
+        analysis = await pipeline.handle_call_update(call_id, status, transcript)
+    else:
+        analysis = await asyncio.to_thread(get_analysis, call_id)
+    if analysis:
+        return {"status": status, "analysis": analysis}
+    if status == "completed":
+        # A failed analysis is retried by the reconciler; say so rather than nothing
+        retry = await asyncio.to_thread(retry_status, call_id)
+        if retry:
+            return {"status": status, "analysis_status": retry}
     return {"status": status}
 
+@app.get("/analysis/metrics")
+async def analysis_metrics():
+    return {**analysis_queue.metrics(), "preanalysis": preanalysis.metrics()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    # Some gauges read the database, so render off the event loop
+    text = await asyncio.to_thread(registry.render)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/reconciler/metrics")
+async def reconciler_metrics():
+    # Only the leader polls; other workers report zeros
+    return {"leader": election.is_leader, **reconciler.metrics()}
+
+@app.get("/providers/metrics")
+async def provider_metrics():
+    return {name: provider.metrics() for name, provider in providers.items()}
+
+@app.get("/reminders/plan")
+async def reminder_plan(day: date):
+    # e.g. /reminders/plan?day=2025-06-05
+    return await asyncio.to_thread(reminder_planner.plan, day)
+
+@app.post("/webhooks/bland")
+async def bland_webhook(request: Request, background_tasks: BackgroundTasks):
+    body = await request.body()
+    if not verify_webhook_signature(body, request.headers.get("X-Webhook-Signature", "")):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+    call_id = event.get("call_id")
+    if not call_id:
+        raise HTTPException(status_code=400, detail="Missing call_id")
+    status = event.get("status") or ("completed" if event.get("completed") else "initiating")
+    # Respond right away; analysis and reminder scheduling run after the response
+    background_tasks.add_task(pipeline.handle_call_update, call_id, status, event.get("concatenated_transcript", ""), event.get("recording_url"))
+    return {"received": True}
+
 @app.post("/upload-contacts/")
-async def upload_contacts(file: UploadFile = File(...)):
-    contents = await file.read()
-    filename = file.filename.lower()
-    if filename.endswith(".csv"):
-        df = pd.read_csv(io.StringIO(contents.decode("utf-8")))
-    elif filename.endswith((".xlsx", ".xls")):
-        df = pd.read_excel(io.BytesIO(contents))
-    else:
+async def upload_contacts(file: UploadFile = File(...), ingest=Depends(get_ingest)):
+    if not ingest.is_supported(file.filename):
         return {"error": "Unsupported file format"}
 
-    results = []
-    for _, row in df.iterrows():
-        name = str(row.get("name", "")).strip()
-        phone = normalize_phone(str(row.get("phone", "")).strip())
-        bank_name = str(row.get("bank_name", "")).strip()
-        voice = str(row.get("voice", "")).strip()
-        tone = str(row.get("tone", "")).strip()
-        due_amount = str(row.get("due_amount", "")).strip()
-        due_date = str(row.get("due_date", "")).strip()
-        
-        # Fixed: Removed extra space in condition
-        if not name or not phone or not bank_name or not voice or not tone or not due_amount or not due_date:
-            continue
-            
-        call_id = initiate_call(name, phone, bank_name, voice, tone, due_amount, due_date)
-        results.append({
-            "name": name,
-            "phone": phone,
-            "status": "initiating" if call_id else "error",
-            "call_id": call_id
-        })
-        time.sleep(2)
-
-    return {"message": "Bulk calls initiated", "results": results}
\ No newline at end of file
+    # Spool the upload to disk in chunks; the ingester streams it from there
+    suffix = os.path.splitext(file.filename)[1].lower()
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        await asyncio.to_thread(shutil.copyfileobj, file.file, tmp, 1024 * 1024)
+
+    # Calls are dispatched in the background; follow them on /events?batch_id=...
+    batch_id = await dialer.submit(ingest.iter_contacts(tmp.name, file.filename), cleanup=tmp.name)
+    return {"message": "Bulk calls queued", "batch_id": batch_id}
+
+@app.get("/batches/{batch_id}")
+async def batch_status(batch_id: str, status: str = None, limit: int = 500, offset: int = 0):
+    batch = await asyncio.to_thread(store.get_batch, batch_id)
+    if batch is None:
+        return {"error": "Unknown batch"}
+    batch["status_counts"] = await asyncio.to_thread(store.status_counts, batch_id)
+    calls = await asyncio.to_thread(store.list_calls, batch_id, status, None, limit, offset)
+    batch["results"] = [
+        {"name": call["name"], "phone": call["phone"], "status": call["status"],
+         "call_id": None if call["call_id"].startswith("unplaced-") else call["call_id"]}
+        for call in calls
+    ]
+    return batch
+
+@app.get("/events")
+async def events(request: Request, batch_id: str = None, call_id: str = None):
+    # One stream per dashboard: /events?batch_id=... or /events?call_id=a,b
+    call_ids = [c for c in call_id.split(",") if c] if call_id else None
+    if not batch_id and not call_ids:
+        return {"error": "batch_id or call_id is required"}
+    return StreamingResponse(
+        status_stream(batch_id, call_ids, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/recordings/{call_id}")
+async def get_recording(call_id: str):
+    path = await recording_fetcher.fetch(call_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Recording not available")
+    return FileResponse(path, media_type="audio/mpeg")
+
+@app.post("/batches/{batch_id}/recordings")
+async def archive_recordings(batch_id: str, background_tasks: BackgroundTasks):
+    calls = await asyncio.to_thread(store.list_calls, batch_id, "completed", None, None)
+    # URLs are looked up on Bland as each download starts
+    background_tasks.add_task(recording_fetcher.archive, ((call["call_id"], None) for call in calls))
+    return {"message": "Archiving recordings", "count": len(calls)}
+
+@app.get("/calls")
+async def list_calls(batch_id: str = None, status: str = None, phone: str = None, limit: int = 500, offset: int = 0):
+    return await asyncio.to_thread(store.list_calls, batch_id, status, phone, limit, offset)
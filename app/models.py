@@ -8,3 +8,24 @@ class CallRequest(BaseModel):
     tone: str
     due_amount: str
     due_date: str
+
+class AmountDueDiscussion(BaseModel):
+    customer_question: str = ""
+    bot_response: str = ""
+
+class Sentiment(BaseModel):
+    tone: str = ""
+    topics_discussed: list[str] = []
+    problems_raised: list[str] = []
+
+class TranscriptAnalysis(BaseModel):
+    """Gemini's analysis of one call; fields the model leaves out take their defaults."""
+    summary: str = ""
+    repayment_phrase: str = ""
+    repayment_date: str = ""
+    issues: str = ""
+    amount_due_discussion: AmountDueDiscussion = AmountDueDiscussion()
+    sentiment: Sentiment = Sentiment()
+
+class BatchTranscriptAnalysis(TranscriptAnalysis):
+    call_id: str
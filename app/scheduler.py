@@ -0,0 +1,14 @@
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from app.db import engine, metadata
+
+# APScheduler (shared by the routes and the call pipeline). Jobs live in the
+# same database as the rest of the app so they survive restarts; missed jobs
+# run once as soon as the scheduler comes back up. Its table is part of the
+# app's metadata, so init_db creates it along with the others.
+scheduler = BackgroundScheduler(
+    jobstores={'default': SQLAlchemyJobStore(engine=engine, metadata=metadata)},
+    executors={'default': ThreadPoolExecutor(10)},
+    job_defaults={'coalesce': True, 'misfire_grace_time': None},
+)
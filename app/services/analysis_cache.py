@@ -0,0 +1,75 @@
+import os
+import json
+import hashlib
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, update
+from dotenv import load_dotenv
+from app.db import engine, analyses, analysis_retries
+
+load_dotenv()
+
+# Failed analyses are retried after ANALYSIS_RETRY_BACKOFF seconds, doubling
+# up to ANALYSIS_RETRY_MAX_BACKOFF, and given up on after ANALYSIS_MAX_ATTEMPTS
+ANALYSIS_RETRY_BACKOFF = float(os.getenv("ANALYSIS_RETRY_BACKOFF", "60"))
+ANALYSIS_RETRY_MAX_BACKOFF = float(os.getenv("ANALYSIS_RETRY_MAX_BACKOFF", "3600"))
+ANALYSIS_MAX_ATTEMPTS = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "12"))
+
+
+def transcript_hash(transcript: str) -> str:
+    return hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+
+
+def get_analysis(call_id: str, digest: str = None):
+    """
+    Return the stored analysis for a call, or None. When `digest` is given the
+    stored result only counts if it was produced from that same transcript.
+    """
+    with engine.connect() as conn:
+        row = conn.execute(select(analyses.c.transcript_hash, analyses.c.result).where(analyses.c.call_id == call_id)).first()
+    if row is None or (digest is not None and row.transcript_hash != digest):
+        return None
+    return json.loads(row.result)
+
+
+def save_analysis(call_id: str, digest: str, result: dict):
+    with engine.begin() as conn:
+        conn.execute(delete(analysis_retries).where(analysis_retries.c.call_id == call_id))
+        conn.execute(delete(analyses).where(analyses.c.call_id == call_id))
+        conn.execute(analyses.insert().values(
+            call_id=call_id, transcript_hash=digest, result=json.dumps(result), created_at=datetime.now()
+        ))
+
+
+def mark_failed(call_id: str, transcript: str):
+    """Record a failed analysis so it is retried later with backoff."""
+    now = datetime.now()
+    with engine.begin() as conn:
+        row = conn.execute(select(analysis_retries.c.attempts).where(analysis_retries.c.call_id == call_id)).first()
+        attempts = (row.attempts if row else 0) + 1
+        values = {
+            "transcript": transcript,
+            "status": "failed" if attempts >= ANALYSIS_MAX_ATTEMPTS else "pending",
+            "attempts": attempts,
+            "next_attempt_at": now + timedelta(seconds=min(ANALYSIS_RETRY_MAX_BACKOFF, ANALYSIS_RETRY_BACKOFF * 2 ** (attempts - 1))),
+            "updated_at": now,
+        }
+        if row is None:
+            conn.execute(analysis_retries.insert().values(call_id=call_id, **values))
+        else:
+            conn.execute(update(analysis_retries).where(analysis_retries.c.call_id == call_id).values(**values))
+
+
+def due_retries(limit: int = 100) -> list:
+    """(call_id, transcript) of failed analyses whose next attempt is due."""
+    with engine.connect() as conn:
+        return conn.execute(
+            select(analysis_retries.c.call_id, analysis_retries.c.transcript)
+            .where(analysis_retries.c.status == "pending", analysis_retries.c.next_attempt_at <= datetime.now())
+            .order_by(analysis_retries.c.next_attempt_at).limit(limit)
+        ).all()
+
+
+def retry_status(call_id: str):
+    """Retry state of a call's analysis: pending, failed (out of attempts) or None."""
+    with engine.connect() as conn:
+        return conn.execute(select(analysis_retries.c.status).where(analysis_retries.c.call_id == call_id)).scalar()
@@ -0,0 +1,199 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from dotenv import load_dotenv
+from app.services.rate_limits import SharedTokenBucket
+from app.services import gemini
+from app.services.telemetry import registry, stage, upstream_requests
+from app.services.resilience import gemini_provider, CircuitOpenError
+
+load_dotenv()
+
+GEMINI_WORKERS = int(os.getenv("GEMINI_WORKERS", "4"))
+GEMINI_REQUESTS_PER_MINUTE = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "60"))
+GEMINI_BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", "5"))
+# Only transcripts shorter than this are packed together into one prompt
+GEMINI_SHORT_TRANSCRIPT_CHARS = int(os.getenv("GEMINI_SHORT_TRANSCRIPT_CHARS", "2000"))
+GEMINI_MAX_BATCH_CHARS = int(os.getenv("GEMINI_MAX_BATCH_CHARS", "8000"))
+GEMINI_BATCH_WAIT = float(os.getenv("GEMINI_BATCH_WAIT", "0.5"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "5"))
+GEMINI_MAX_BACKOFF = float(os.getenv("GEMINI_MAX_BACKOFF", "60"))
+
+
+def is_quota_error(error: Exception) -> bool:
+    return getattr(error, "code", None) == 429 or type(error).__name__ == "ResourceExhausted" or "429" in str(error)
+
+
+class AnalysisQueue:
+    """
+    Bounded worker pool in front of Gemini. Short transcripts are packed into
+    a single structured prompt and split back out per call; quota errors pause
+    every worker with exponential backoff. The request rate is shared by all
+    worker processes through the database.
+    """
+
+    def __init__(self, model=None, workers: int = GEMINI_WORKERS, requests_per_minute: float = GEMINI_REQUESTS_PER_MINUTE,
+                 batch_size: int = GEMINI_BATCH_SIZE, short_chars: int = GEMINI_SHORT_TRANSCRIPT_CHARS,
+                 max_batch_chars: int = GEMINI_MAX_BATCH_CHARS, batch_wait: float = GEMINI_BATCH_WAIT):
+        self.model = model
+        self.workers = workers
+        self.bucket = SharedTokenBucket("gemini", requests_per_minute / 60, workers)
+        self.batch_size = batch_size
+        self.short_chars = short_chars
+        self.max_batch_chars = max_batch_chars
+        self.batch_wait = batch_wait
+        self.queue = None
+        self._tasks = []
+        self._pause_until = 0.0
+        self._backoff = 1.0
+        self._completed = deque()
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "requests": 0, "batched_requests": 0, "quota_errors": 0,
+                      "circuit_rejected": 0}
+
+    def _ensure_started(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.queue = None
+
+    async def analyze(self, call_id: str, transcript: str) -> dict:
+        """Queue one transcript and wait for its analysis ({} on failure)."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self.stats["submitted"] += 1
+        await self.queue.put((call_id, transcript, future))
+        return await future
+
+    def metrics(self) -> dict:
+        now = time.monotonic()
+        while self._completed and now - self._completed[0] > 60:
+            self._completed.popleft()
+        return {
+            **self.stats,
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "workers": self.workers,
+            "throughput_per_minute": len(self._completed),
+            "paused_for": max(0.0, self._pause_until - now),
+            "parse": dict(gemini.parse_stats),
+        }
+
+    def _is_short(self, transcript: str) -> bool:
+        return len(transcript) < self.short_chars
+
+    async def _collect_batch(self, first):
+        batch = [first]
+        if not self._is_short(first[1]):
+            return batch, None
+        size = len(first[1])
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get_nowait() if remaining <= 0 else await asyncio.wait_for(self.queue.get(), remaining)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if not self._is_short(item[1]) or size + len(item[1]) > self.max_batch_chars:
+                # Doesn't fit; the same worker handles it on its own next
+                return batch, item
+            batch.append(item)
+            size += len(item[1])
+        return batch, None
+
+    async def _worker(self):
+        carry = None
+        while True:
+            item = carry or await self.queue.get()
+            carry = None
+            batch, carry = await self._collect_batch(item)
+            try:
+                await self._process(batch)
+            except Exception:
+                logging.exception("Analysis worker failed")
+                self._resolve(batch, {})
+
+    def _resolve(self, batch, results):
+        for call_id, _, future in batch:
+            if future.done():
+                continue
+            result = results.get(call_id, {})
+            future.set_result(result)
+            self.stats["completed" if result else "failed"] += 1
+            self._completed.append(time.monotonic())
+
+    async def _generate(self, prompt: str, config: dict = None) -> str:
+        model = self.model or await asyncio.to_thread(gemini.get_model)
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            delay = self._pause_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.bucket.acquire()
+            self.stats["requests"] += 1
+            try:
+                # The bare model call, apart from the queueing in the "analysis" stage
+                with stage("gemini"):
+                    res = await gemini_provider.call(asyncio.to_thread, model.generate_content, prompt, generation_config=config,
+                                                     request_options={"timeout": gemini_provider.timeout})
+            except CircuitOpenError as e:
+                self.stats["circuit_rejected"] += 1
+                if attempt == GEMINI_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(max(e.retry_after, 1.0))
+                continue
+            except Exception as e:
+                upstream_requests.inc("gemini", "quota" if is_quota_error(e) else "error")
+                if not is_quota_error(e) or attempt == GEMINI_MAX_RETRIES:
+                    raise
+                self.stats["quota_errors"] += 1
+                self._pause_until = max(self._pause_until, time.monotonic() + self._backoff)
+                logging.warning(f"Gemini quota hit, pausing analysis for {self._backoff:.1f}s")
+                self._backoff = min(self._backoff * 2, GEMINI_MAX_BACKOFF)
+                continue
+            upstream_requests.inc("gemini", "ok")
+            self._backoff = 1.0
+            return res.text
+
+    async def _analyze_one(self, call_id: str, transcript: str) -> dict:
+        try:
+            result = gemini.parse_analysis(await self._generate(gemini.build_prompt(transcript), gemini.generation_config()))
+            return result.model_dump() if result else {}
+        except Exception as e:
+            print("Gemini error:", e)
+            return {}
+
+    async def _process(self, batch):
+        if len(batch) == 1:
+            call_id, transcript, _ = batch[0]
+            self._resolve(batch, {call_id: await self._analyze_one(call_id, transcript)})
+            return
+
+        self.stats["batched_requests"] += 1
+        try:
+            text = await self._generate(gemini.build_batch_prompt([(call_id, transcript) for call_id, transcript, _ in batch]),
+                                        gemini.generation_config(batch=True))
+            results = gemini.parse_batch_response(text)
+        except Exception as e:
+            print("Gemini batch error:", e)
+            results = {}
+        # Anything the model dropped from the batch is retried on its own
+        for call_id, transcript, _ in batch:
+            if not results.get(call_id):
+                results[call_id] = await self._analyze_one(call_id, transcript)
+        self._resolve(batch, results)
+
+
+analysis_queue = AnalysisQueue()
+
+registry.gauge("analysis_queue_depth", "Transcripts waiting for a Gemini worker",
+               lambda: analysis_queue.queue.qsize() if analysis_queue.queue else 0)
+registry.gauge("analysis_paused_seconds", "Seconds left in a Gemini quota pause",
+               lambda: max(0.0, analysis_queue._pause_until - time.monotonic()))
+registry.gauge("analysis_total", "Analysis queue totals", lambda: analysis_queue.stats, "event", kind="counter")
+registry.gauge("gemini_parse_total", "Gemini responses by how they parsed", lambda: gemini.parse_stats, "result", kind="counter")
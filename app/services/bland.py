@@ -1,9 +1,13 @@
 import os
+import hmac
+import hashlib
+import random
+import asyncio
 import logging
-import requests
-import inflect
-from datetime import datetime
-from app.utils import normalize_phone
+import httpx
+from app.services.payloads import build_payload
+from app.services.telemetry import stage, stage_errors, upstream_requests
+from app.services.resilience import bland_provider, CircuitOpenError
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,132 +16,161 @@ logging.basicConfig(level=logging.INFO)
 
 headers = {'Authorization': f'Bearer {os.getenv("BLAND_API_KEY")}'}
 
-# Utility to convert number to readable words (e.g., 2000 -> two thousand)
-p = inflect.engine()
-
-def initiate_call(name: str, phone: str, bank_name: str, voice:str, tone: str, due_amount: str, due_date: str):
-    phone = normalize_phone(phone)
-
-    # Assuming due_amount and due_date are strings
-    formatted_amount = format_amount_readable(due_amount) + " rupees"
-    formatted_due_date = format_date_readable(due_date)
-
-    #Mapping the tone
-    tone_map = {
-    "soft": "soft and polite",
-    "neutral": "neutral and professional",
-    "firm": "firm and direct",
-    "assertive": "assertive and insistent",
-    "harsh": "harsh and demanding"
-}
-    tone_style = tone_map.get(tone, "neutral and professional")
-
-    # Voice mapping - handle custom voice vs standard voices
-    voice_id = get_voice_id(voice)
-
-    payload = {
-        "phone_number": phone,
-        "voice": voice_id,
-        "wait_for_greeting": False,
-        "record": True,
-        "answered_by_enabled": True,
-        "noise_cancellation": True,
-        "interruption_threshold": 100,
-        "block_interruptions": False,
-        "max_duration": 12,
-        "model": "base",
-        "language": "en",
-        "background_track": "office",
-        "voicemail_action": "hangup",
-        "task": f"""
-Goal: Call customers to remind them of their overdue loan payment. Confirm when they can make the payment, assess their willingness and financial condition, and warn about consequences if they refuse or delay.
-
-Your speaking style should be {tone_style}. Be consistent with this tone throughout the conversation.
-
-Call Flow:
-
-1. Greet the person and ask, "Am I speaking with {name}?"
-2. If the person says **yes**:
-    - Introduce yourself as an assistant from {bank_name}.
-    - Inform them that their recent loan payment of {formatted_amount} was due on {formatted_due_date} and is currently overdue.
-    - Ask when they will be able to make the payment.
-    - If they give vague responses, excuses, or delay:
-        - Ask about their current financial condition.
-        - Clarify whether they genuinely can't pay or are unwilling to pay.
-        - Ask for the earliest possible date they can repay.
-    - If they continue avoiding payment or provide unreasonable excuses:
-        - Warn that legal action may be initiated.
-        - Inform that their CIBIL score will be negatively affected.
-        - State that recovery agents may be sent to their registered address.
-    - Be {tone_style}. Do not accept vague answers.
-    - Repeat the urgency and consequences until a concrete response is received.
-    - End the call by summarizing the discussed repayment date and thanking them.
-
-3. If the person says **no**:
-    - Politely ask who you are speaking with.
-    - Ask if they are related to or can help you contact {name}.
-    - If they confirm a relationship (e.g., family), politely ask them to pass on the message that there is an overdue loan payment and the bank is trying to reach {name}.
-    - If they are not related or unsure, thank them and end the call.
-
-Background:
-
-I am an AI assistant created by {bank_name} to follow up on overdue loan repayments. Ensuring timely recovery protects the customer's credit history and supports the bank’s financial operations. This call is a formal reminder and may lead to further action in case of continued non-compliance.
-""",
-        "first_sentence": f"Hello, this is {bank_name} calling. Am I speaking with {name}?"
-    }
-    response = requests.post("https://api.bland.ai/v1/calls", json=payload, headers=headers)
+BLAND_API_BASE = os.getenv("BLAND_API_BASE", "https://api.bland.ai")
+BLAND_TIMEOUT = float(os.getenv("BLAND_TIMEOUT", "15"))
+BLAND_CONNECT_TIMEOUT = float(os.getenv("BLAND_CONNECT_TIMEOUT", "5"))
+BLAND_MAX_RETRIES = int(os.getenv("BLAND_MAX_RETRIES", "3"))
+BLAND_BACKOFF = float(os.getenv("BLAND_BACKOFF", "0.5"))
+BLAND_POOL_SIZE = int(os.getenv("BLAND_POOL_SIZE", "20"))
+
+# Post-call webhook; when set, Bland pushes completed calls to /webhooks/bland
+WEBHOOK_URL = os.getenv("BLAND_WEBHOOK_URL")
+WEBHOOK_SECRET = os.getenv("BLAND_WEBHOOK_SECRET", "")
+
+# Errors where the request never reached Bland, so even a POST is safe to resend
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _is_failure(response: httpx.Response) -> bool:
+    # Bland being overloaded or broken; 4xx are our own mistakes
+    return response.status_code == 429 or response.status_code >= 500
+
+
+class BlandClient:
+    """
+    Async Bland API client sharing one keep-alive connection pool.
+    Retries are bounded with exponential backoff; non-idempotent requests
+    (call creation) are only retried when Bland never saw them.
+    """
+
+    def __init__(self, base_url: str = BLAND_API_BASE, timeout: float = BLAND_TIMEOUT, connect_timeout: float = BLAND_CONNECT_TIMEOUT,
+                 max_retries: int = BLAND_MAX_RETRIES, backoff: float = BLAND_BACKOFF, pool_size: int = BLAND_POOL_SIZE):
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, headers=headers, timeout=self.timeout, limits=self.limits)
+        return self._client
+
+    def _delay(self, attempt: int, response: httpx.Response = None) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    async def _send(self, method: str, path: str, **kwargs) -> httpx.Response:
+        try:
+            return await bland_provider.call(self.client.request, method, path, is_failure=_is_failure, **kwargs)
+        except asyncio.TimeoutError:
+            raise httpx.ReadTimeout(f"Bland {method} {path} took longer than {bland_provider.timeout}s") from None
+
+    async def request(self, method: str, path: str, idempotent: bool = True, **kwargs) -> httpx.Response:
+        """
+        Send a request with retries. Raises CircuitOpenError without trying
+        while Bland's circuit is open.
+        """
+        for attempt in range(self.max_retries + 1):
+            last_try = attempt == self.max_retries
+            try:
+                response = await self._send(method, path, **kwargs)
+            except _NOT_SENT_ERRORS:
+                upstream_requests.inc("bland", "connect_error")
+                if last_try:
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+                continue
+            except httpx.TransportError:
+                upstream_requests.inc("bland", "transport_error")
+                if last_try or not idempotent:
+                    raise
+                await asyncio.sleep(self._delay(attempt))
+                continue
+            upstream_requests.inc("bland", f"{response.status_code // 100}xx" if response.status_code != 429 else "429")
+            # 429 means the call was rejected, so it is safe to resend either way
+            retryable = response.status_code == 429 or (idempotent and response.status_code in _RETRY_STATUSES)
+            if not retryable or last_try:
+                return response
+            logging.warning(f"Bland {method} {path} returned {response.status_code}, retrying")
+            await asyncio.sleep(self._delay(attempt, response))
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+client = BlandClient()
+
+async def initiate_call(name: str, phone: str, bank_name: str, voice:str, tone: str, due_amount: str, due_date: str):
+    return await place_call(build_payload(name, phone, bank_name, voice, tone, due_amount, due_date))
+
+async def place_call(payload: dict):
+    """
+    Send a prebuilt payload (see app.services.payloads) and return the call_id,
+    or None if Bland refused it. Raises CircuitOpenError while Bland is down,
+    so callers can wait instead of giving up on the call.
+    """
+    if WEBHOOK_URL:
+        payload["webhook"] = WEBHOOK_URL
+    with stage("dial"):
+        try:
+            response = await client.request("POST", "/v1/calls", idempotent=False, json=payload)
+        except httpx.HTTPError:
+            logging.exception("Exception while initiating call")
+            stage_errors.inc("dial")
+            return None
     if response.status_code != 200:
         logging.error(f"Call initiation failed: {response.status_code}, {response.text}")
+        stage_errors.inc("dial")
         return None
     return response.json().get("call_id")
 
-def get_voice_id(voice: str):
+def verify_webhook_signature(body: bytes, signature: str) -> bool:
     """
-    Map frontend voice selection to Bland AI voice IDs
-    Handle both custom voices and standard Bland AI voices
+    Check the HMAC-SHA256 signature Bland sends with each webhook.
+    Without a configured secret every webhook is rejected.
     """
-    # Voice mapping dictionary
-    voice_mapping = {
-        # Custom voice
-        "shashi": "shashi",  # Your custom cloned voice ID
-        
-        # Bland AI Female voices
-        "adriana": "adriana",
-        "evelyn": "evelyn",
-        "june": "june",
-        "maya": "maya",
-        "ruth": "ruth",
-        
-        # Bland AI Male voices
-        "brady": "brady",
-        "karl": "karl",
-        "mason": "mason",
-        "public - hank (boss)": "public - hank (boss)"
-    }
-    
-    # Return the mapped voice or default to the custom voice
-    return voice_mapping.get(voice, "shashi")
-
-def format_amount_readable(amount):
-    try:
-        return p.number_to_words(int(amount), andword="").replace(",", "")
-    except:
-        return str(amount)
-
-def format_date_readable(date_str):
-    try:
-        dt = datetime.strptime(date_str, "%Y-%m-%d")
-        return dt.strftime("%B %d, %Y")  # e.g., "June 1, 2025"
-    except:
-        return date_str
+    if not WEBHOOK_SECRET or not signature:
+        return False
+    expected = hmac.new(WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.strip())
+
+async def get_call_details(call_id: str):
+    """Full call record from Bland (status, transcript, recording_url, ...), or None."""
+    with stage("status_fetch"):
+        try:
+            response = await client.request("GET", f"/v1/calls/{call_id}")
+        except CircuitOpenError:
+            stage_errors.inc("status_fetch")
+            return None
+        except httpx.HTTPError:
+            logging.exception("Exception while fetching call details")
+            stage_errors.inc("status_fetch")
+            return None
+    if response.status_code != 200:
+        logging.error(f"Failed to fetch call details: {response.status_code}, {response.text}")
+        stage_errors.inc("status_fetch")
+        return None
+    return response.json()
 
-def check_bland_call_status(call_id: str):
+async def check_bland_call_status(call_id: str):
     try:
-        response = requests.get(f"https://api.bland.ai/v1/calls/{call_id}", headers=headers)
+        with stage("status_fetch"):
+            response = await client.request("GET", f"/v1/calls/{call_id}")
         if response.status_code == 200:
             data = response.json()
             return data.get("status"), data.get("concatenated_transcript", "")
         logging.error(f"Failed to fetch status: {response.status_code}, {response.text}")
+        stage_errors.inc("status_fetch")
+        return "error", ""
+    except CircuitOpenError:
         return "error", ""
     except:
         logging.exception("Exception while checking call status")
@@ -0,0 +1,214 @@
+import json
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, func, and_, or_, exists, literal
+from app.db import engine, batches, calls, dial_queue, leases, upsert
+
+# "no_calling_window": never dialed, as the number's local time is unknown (see calling_windows)
+TERMINAL_STATUSES = {"completed", "failed", "no_answered", "no-answer", "busy", "canceled", "error", "no_calling_window"}
+
+
+class CallStore(ABC):
+    """
+    Campaign/call repository interface. The SQL implementation below covers
+    SQLite and Postgres (including Supabase's Postgres) through DATABASE_URL;
+    other backends only need to provide these methods.
+    """
+
+    @abstractmethod
+    def upsert_calls(self, records: list[dict]):
+        ...
+
+    @abstractmethod
+    def get_call(self, call_id: str):
+        ...
+
+    @abstractmethod
+    def list_calls(self, batch_id: str = None, status: str = None, phone: str = None, limit: int = 500, offset: int = 0):
+        ...
+
+    @abstractmethod
+    def pending_calls(self, older_than: timedelta = timedelta(0), since: datetime = None, limit: int = 1000):
+        ...
+
+    @abstractmethod
+    def create_batch(self, batch_id: str):
+        ...
+
+    @abstractmethod
+    def update_batch(self, batch_id: str, **fields):
+        ...
+
+    @abstractmethod
+    def get_batch(self, batch_id: str):
+        ...
+
+    @abstractmethod
+    def status_counts(self, batch_id: str):
+        ...
+
+    @abstractmethod
+    def calls_updated_since(self, since: datetime = None, batch_id: str = None, call_ids: list[str] = None):
+        ...
+
+    @abstractmethod
+    def queue_rows(self, batch_id: str, rows: dict):
+        ...
+
+    @abstractmethod
+    def claim_queued(self, claimer: str):
+        ...
+
+    @abstractmethod
+    def take_queued(self, row_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    def add_batch_counts(self, batch_id: str, dispatched: int, failed: int):
+        ...
+
+    @abstractmethod
+    def finishable_batches(self):
+        ...
+
+
+class SQLCallStore(CallStore):
+
+    def __init__(self, engine=engine):
+        self.engine = engine
+
+    def upsert_calls(self, records: list[dict]):
+        """
+        Bulk insert or update call records ({"call_id", "status", ...}). Only
+        the keys a record carries are updated on an existing call, and calls
+        already in a terminal status keep it, so late or replayed events can't
+        move a finished call backwards.
+        """
+        if not records:
+            return
+        now = datetime.now()
+        # Rows are grouped by their key set so each group is one executemany
+        groups = {}
+        for record in records:
+            groups.setdefault(tuple(sorted(record)), []).append(record)
+        with self.engine.begin() as conn:
+            for keys, group in groups.items():
+                columns = [col for col in keys if col not in ("call_id", "created_at")] + ["updated_at"]
+                rows = [{"status": "initiating", "created_at": now, **record, "updated_at": now} for record in group]
+                # Plain comparisons rather than NOT IN, which can't be used with executemany
+                not_terminal = and_(*(calls.c.status != status for status in sorted(TERMINAL_STATUSES)))
+                upsert(conn, calls, rows, columns, where=not_terminal)
+
+    def get_call(self, call_id: str):
+        with self.engine.connect() as conn:
+            row = conn.execute(select(calls).where(calls.c.call_id == call_id)).mappings().first()
+        return dict(row) if row else None
+
+    def list_calls(self, batch_id: str = None, status: str = None, phone: str = None, limit: int = 500, offset: int = 0):
+        query = select(calls)
+        if batch_id:
+            query = query.where(calls.c.batch_id == batch_id)
+        if status:
+            query = query.where(calls.c.status == status)
+        if phone:
+            query = query.where(calls.c.phone == phone)
+        query = query.order_by(calls.c.created_at, calls.c.call_id).limit(limit).offset(offset)
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query).mappings()]
+
+    def pending_calls(self, older_than: timedelta = timedelta(0), since: datetime = None, limit: int = 1000):
+        """Non-terminal calls created more than `older_than` ago (and after `since`), oldest first."""
+        query = select(calls).where(calls.c.status.notin_(TERMINAL_STATUSES), calls.c.created_at <= datetime.now() - older_than)
+        if since is not None:
+            query = query.where(calls.c.created_at >= since)
+        query = query.order_by(calls.c.created_at).limit(limit)
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query).mappings()]
+
+    def create_batch(self, batch_id: str):
+        now = datetime.now()
+        with self.engine.begin() as conn:
+            conn.execute(batches.insert().values(batch_id=batch_id, created_at=now, updated_at=now, total=0, dispatched=0,
+                                                 failed=0, rejected_count=0, rejected="[]", done=False))
+
+    def update_batch(self, batch_id: str, **fields):
+        if "rejected" in fields:
+            fields["rejected"] = json.dumps(fields["rejected"])
+        with self.engine.begin() as conn:
+            conn.execute(update(batches).where(batches.c.batch_id == batch_id).values(updated_at=datetime.now(), **fields))
+
+    def get_batch(self, batch_id: str):
+        with self.engine.connect() as conn:
+            row = conn.execute(select(batches).where(batches.c.batch_id == batch_id)).mappings().first()
+        if row is None:
+            return None
+        batch = dict(row)
+        batch["rejected"] = json.loads(batch["rejected"])
+        return batch
+
+    def status_counts(self, batch_id: str):
+        query = select(calls.c.status, func.count()).where(calls.c.batch_id == batch_id).group_by(calls.c.status)
+        with self.engine.connect() as conn:
+            return {status: count for status, count in conn.execute(query)}
+
+    def calls_updated_since(self, since: datetime = None, batch_id: str = None, call_ids: list[str] = None):
+        """Calls of a batch (or an explicit id list) updated at or after `since`."""
+        query = select(calls.c.call_id, calls.c.name, calls.c.phone, calls.c.status, calls.c.updated_at)
+        if batch_id:
+            query = query.where(calls.c.batch_id == batch_id)
+        if call_ids:
+            query = query.where(calls.c.call_id.in_(call_ids))
+        if since is not None:
+            query = query.where(calls.c.updated_at >= since)
+        with self.engine.connect() as conn:
+            return [dict(row) for row in conn.execute(query.order_by(calls.c.updated_at)).mappings()]
+
+    def queue_rows(self, batch_id: str, rows: dict):
+        """Add a batch's rows to the dial queue ({row_id: request as JSON})."""
+        if not rows:
+            return
+        now = datetime.now()
+        with self.engine.begin() as conn:
+            conn.execute(dial_queue.insert(), [{"row_id": row_id, "batch_id": batch_id, "request": request,
+                                                "created_at": now} for row_id, request in rows.items()])
+
+    def claim_queued(self, claimer: str):
+        """
+        Claim every queued row not already claimed by `claimer` (new uploads,
+        or rows a previous leader held) and return them as
+        {"row_id", "batch_id", "request"}, oldest first.
+        """
+        token = uuid.uuid4().hex
+        with self.engine.begin() as conn:
+            conn.execute(update(dial_queue)
+                         .where(or_(dial_queue.c.claimed_by.is_(None), dial_queue.c.claimed_by != claimer))
+                         .values(claimed_by=claimer, claim=token))
+            query = (select(dial_queue.c.row_id, dial_queue.c.batch_id, dial_queue.c.request)
+                     .where(dial_queue.c.claim == token).order_by(dial_queue.c.created_at))
+            return [dict(row) for row in conn.execute(query).mappings()]
+
+    def take_queued(self, row_id: str) -> bool:
+        """Remove a row from the dial queue; False if it was already taken."""
+        with self.engine.begin() as conn:
+            return conn.execute(delete(dial_queue).where(dial_queue.c.row_id == row_id)).rowcount == 1
+
+    def add_batch_counts(self, batch_id: str, dispatched: int, failed: int):
+        """Add to a batch's dialed and failed counts."""
+        with self.engine.begin() as conn:
+            conn.execute(update(batches).where(batches.c.batch_id == batch_id).values(
+                dispatched=batches.c.dispatched + dispatched, failed=batches.c.failed + failed, updated_at=datetime.now()))
+
+    def finishable_batches(self):
+        """
+        Ids of unfinished batches that are no longer being read (their upload
+        lease is gone or expired) and have no rows left in the dial queue.
+        """
+        reading = select(leases.c.name).where(leases.c.name == literal("batch:") + batches.c.batch_id,
+                                              leases.c.expires_at > datetime.now())
+        queued = select(dial_queue.c.row_id).where(dial_queue.c.batch_id == batches.c.batch_id)
+        query = select(batches.c.batch_id).where(batches.c.done.is_(False), ~exists(reading), ~exists(queued))
+        with self.engine.connect() as conn:
+            return [batch_id for batch_id, in conn.execute(query)]
+
+store = SQLCallStore()
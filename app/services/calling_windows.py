@@ -0,0 +1,101 @@
+import os
+from datetime import datetime, date, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+from dotenv import load_dotenv
+from app.utils import PHONE_REGIONS
+
+load_dotenv()
+
+DEFAULT_PHONE_REGION = os.getenv("DEFAULT_PHONE_REGION", "IN").upper()
+
+# Time zones a region's numbers can be in. A call is only placed while it is
+# inside the calling window in all of them; the east- and westernmost zones
+# are enough to bound the ones in between. Numbers from other countries are
+# not dialed, since their local time is unknown.
+REGION_TIMEZONES = {
+    "IN": ("Asia/Kolkata",),
+    "US": ("America/New_York", "America/Los_Angeles"),
+    "GB": ("Europe/London",),
+    "AE": ("Asia/Dubai",),
+    "AU": ("Australia/Sydney", "Australia/Perth"),
+    "SG": ("Asia/Singapore",),
+}
+
+
+def parse_window(text: str):
+    """'09:00-20:00' -> (time(9), time(20)); an end of 24:00 means midnight."""
+    start, end = (part.strip() for part in text.split("-"))
+    start, end = time.fromisoformat(start), time.max if end == "24:00" else time.fromisoformat(end)
+    if start >= end:
+        raise ValueError(f"Calling window {text!r} must start before it ends")
+    return start, end
+
+
+# Local hours calls may be placed in: CALLING_WINDOW for every region,
+# overridden per region with e.g. CALLING_WINDOWS="US=08:00-21:00,IN=10:00-19:00"
+CALLING_WINDOW = parse_window(os.getenv("CALLING_WINDOW", "09:00-20:00"))
+CALLING_WINDOWS = {
+    region.strip().upper(): parse_window(window)
+    for region, window in (item.split("=") for item in os.getenv("CALLING_WINDOWS", "").split(",") if item.strip())
+}
+
+# Country calling code -> region, longest codes first; +1 numbers count as US
+_CODES = sorted({code: region for region, (code, _) in reversed(PHONE_REGIONS.items())}.items(),
+                key=lambda item: -len(item[0]))
+
+
+def region_of(phone: str):
+    """Region of an E.164 number, or None for country codes we don't dial; national numbers count as DEFAULT_PHONE_REGION."""
+    if not phone.startswith("+"):
+        return DEFAULT_PHONE_REGION
+    for code, region in _CODES:
+        if phone[1:].startswith(code):
+            return region
+    return None
+
+
+def _window_start(zone: ZoneInfo, window, at: datetime) -> datetime:
+    """`at` if it falls inside the window in `zone`, else when the next one opens."""
+    start, end = window
+    local = at.astimezone(zone)
+    if start <= local.time() < end:
+        return at
+    day = local.date() if local.time() < start else local.date() + timedelta(days=1)
+    return datetime.combine(day, start, tzinfo=zone).astimezone(timezone.utc)
+
+
+def next_call_time(phone: str, now: datetime = None):
+    """
+    Earliest time (UTC, >= now) the number may be called, or None if its
+    region has no configured time zones or they never share a moment
+    inside the window.
+    """
+    region = region_of(phone)
+    if region not in REGION_TIMEZONES:
+        return None
+    window = CALLING_WINDOWS.get(region, CALLING_WINDOW)
+    zones = [ZoneInfo(name) for name in REGION_TIMEZONES[region]]
+    at = now or datetime.now(timezone.utc)
+    # Pushing past one zone's closed hours can land in another's; a couple
+    # of days of searching settles it or shows there is no overlap
+    for _ in range(2 * len(zones) + 2):
+        candidate = at
+        for zone in zones:
+            candidate = _window_start(zone, window, candidate)
+        if candidate == at:
+            return at
+        at = candidate
+    return None
+
+
+def priority(due_amount: str, due_date: str, today: date = None) -> float:
+    """Dial order score: amount owed times days overdue (at least one, so not-yet-due accounts rank by amount)."""
+    try:
+        amount = float(due_amount)
+    except (TypeError, ValueError):
+        amount = 0.0
+    try:
+        overdue = ((today or date.today()) - date.fromisoformat(due_date)).days
+    except (TypeError, ValueError):
+        overdue = 0
+    return amount * max(overdue, 1)
@@ -0,0 +1,180 @@
+import re
+import calendar
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import NamedTuple
+
+
+class DateResolution(NamedTuple):
+    date: date
+    phrase: str
+    confidence: float
+
+
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+MONTHS["sept"] = 9
+# Full names only: abbreviations like "sat" and "sun" are ordinary words too
+WEEKDAYS = {name.lower(): i for i, name in enumerate(calendar.day_name)}
+NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+                "eight": 8, "nine": 9, "ten": 10, "fifteen": 15, "twenty": 20, "thirty": 30,
+                "couple of": 2, "a couple of": 2, "few": 3, "a few": 3}
+
+_MONTH = "|".join(sorted(MONTHS, key=len, reverse=True))
+_WEEKDAY = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+# The grammar is compiled with re.X, so spaces inside words must be spelled \s+
+_NUMBER = r"\d{1,2}|" + "|".join(word.replace(" ", r"\s+") for word in sorted(NUMBER_WORDS, key=len, reverse=True))
+_DAY = r"(?:3[01]|[12]\d|0?[1-9])(?:st|nd|rd|th)?"
+_ORDINAL = r"(?:3[01]|[12]\d|0?[1-9])(?:st|nd|rd|th)"
+RECENT_PAST_DAYS = 90
+# Numbers followed by these are ranges or amounts ("2-3 days", "1.5 lakh"), not dates
+_NOT_A_DATE = r"(?!\s*(?:days?|weeks?|months?|years?|hours?|din|mahine|lakhs?|thousand|rupees|rs\b|k\b))"
+
+# One alternation per phrase family, compiled once; the group name says how to resolve it
+GRAMMAR = re.compile(r"""
+    (?P<iso>\b\d{4}-\d{2}-\d{2}\b)
+  | (?P<numeric>\b(?:3[01]|[12]\d|0?[1-9])(?:[/.](?:1[0-2]|0?[1-9])(?:[/.](?:\d{4}|\d{2}))?|-(?:1[0-2]|0?[1-9])-(?:\d{4}|\d{2}))\b""" + _NOT_A_DATE + r""")
+  | (?P<day_month>\b""" + _DAY + r"""\s+(?:of\s+)?(?:""" + _MONTH + r""")\.?(?:,?\s+\d{4})?\b)
+  | (?P<month_day>\b(?:""" + _MONTH + r""")\.?\s+""" + _DAY + r"""(?:,?\s+\d{4})?\b)
+  | (?P<day_next_month>\b""" + _DAY + r"""\s+(?:of\s+)?(?:next|coming)\s+month\b)
+  | (?P<month_end>\b(?:end\s+of\s+(?:this\s+|the\s+)?month|month[\s-]end)\b)
+  | (?P<day_after>\b(?:day\s+after\s+tomorrow|parso|parson)\b)
+  | (?P<tomorrow>\b(?:tomorrow|tmrw|tomorow|kal)\b)
+  | (?P<today>\b(?:today|aaj)\b)
+  | (?P<span>\b(?:in|after|within)\s+(?:the\s+next\s+)?(?:""" + _NUMBER + r""")\s+(?:days?|weeks?|months?)\b)
+  | (?P<weekday>\b(?:(?:this|next|coming)\s+)?(?:""" + _WEEKDAY + r""")\b)
+  | (?P<weekend>\b(?:this|next|the)\s+weekend\b)
+  | (?P<next_unit>\b(?:next|coming)\s+(?:week|month)\b)
+  | (?P<day_only>\b(?:by|on|before)\s+(?:the\s+)?""" + _ORDINAL + r"""\b(?!\s+(?:of\b|next\b|coming\b|""" + _MONTH + r"""))|\b""" + _DAY + r"""\s+(?:tarikh|tareekh|tarik)\b)
+""", re.I | re.X)
+
+# A negation in the same clause ("can't pay tomorrow") makes a date unlikely to be the commitment
+_NEGATION = re.compile(r"\b(?:not|can't|cannot|won't|unable|no)\b", re.I)
+_CLAUSE_BREAK = re.compile(r"\bbut\b|\binstead\b|\bso\b|[,.;!?]", re.I)
+
+
+def _add_months(day: date, months: int, day_of_month: int = None) -> date:
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    last = calendar.monthrange(year, month)[1]
+    return date(year, month, min(day_of_month or day.day, last))
+
+
+def _upcoming(today: date, month: int, day: int):
+    """
+    Next `month`/`day` on or after today. A date that passed within the last
+    RECENT_PAST_DAYS is taken as a past date ("paid on 1st May"), not next year's.
+    """
+    try:
+        candidate = date(today.year, month, day)
+    except ValueError:
+        return None
+    if candidate >= today:
+        return candidate
+    if (today - candidate).days <= RECENT_PAST_DAYS:
+        return None
+    return _add_months(candidate, 12, day)
+
+
+def _day_number(text: str) -> int:
+    return int(re.match(r"\d+", text.strip()).group())
+
+
+def _year(text: str) -> int:
+    year = int(text)
+    return year + 2000 if year < 100 else year
+
+
+@lru_cache(maxsize=4096)
+def resolve_phrase(kind: str, phrase: str, today: date):
+    """Resolve one grammar match to (date, confidence); cached per phrase and day."""
+    words = phrase.replace(",", " ").replace(".", " ").split()
+    if kind == "iso":
+        return date.fromisoformat(phrase), 0.99
+    if kind == "numeric":
+        # Indian convention: day first
+        parts = [int(p) for p in re.split(r"[/.-]", phrase)]
+        if len(parts) == 3:
+            return date(_year(str(parts[2])), parts[1], parts[0]), 0.9
+        found = _upcoming(today, parts[1], parts[0])
+        return found, 0.75
+    if kind in ("day_month", "month_day"):
+        day = next(_day_number(w) for w in words if w[0].isdigit() and len(w) <= 4)
+        month = next(MONTHS[w] for w in words if w in MONTHS)
+        year = next((int(w) for w in words if w.isdigit() and len(w) == 4), None)
+        if year:
+            return date(year, month, day), 0.95
+        return _upcoming(today, month, day), 0.9
+    if kind == "day_next_month":
+        return _add_months(today, 1, _day_number(words[0])), 0.9
+    if kind == "month_end":
+        return _add_months(today, 0, 31), 0.75
+    if kind == "day_after":
+        return today + timedelta(days=2), 0.95 if "tomorrow" in words else 0.7
+    if kind == "tomorrow":
+        # "kal" is both tomorrow and yesterday in Hindi; a payment promise means tomorrow
+        return today + timedelta(days=1), 0.7 if words == ["kal"] else 0.95
+    if kind == "today":
+        return today, 0.9
+    if kind == "span":
+        number = " ".join(words[1:-1]).replace("the next ", "").strip()
+        count = int(number) if number.isdigit() else NUMBER_WORDS[number]
+        unit = words[-1].rstrip("s")
+        if unit == "month":
+            resolved = _add_months(today, count)
+        else:
+            resolved = today + timedelta(days=count * (7 if unit == "week" else 1))
+        return resolved, 0.8 if words[0] == "within" else 0.85
+    if kind == "weekday":
+        weekday = WEEKDAYS[words[-1]]
+        ahead = (weekday - today.weekday()) % 7 or 7
+        if words[0] == "next" and today + timedelta(days=ahead) <= today + timedelta(days=6 - today.weekday()):
+            # "next Friday" said on a Monday means the Friday after this one
+            return today + timedelta(days=ahead + 7), 0.6
+        return today + timedelta(days=ahead), 0.8
+    if kind == "weekend":
+        ahead = (5 - today.weekday()) % 7
+        return today + timedelta(days=ahead + (7 if words[0] == "next" else 0)), 0.6
+    if kind == "next_unit":
+        if words[-1] == "week":
+            return today + timedelta(days=7), 0.6
+        return _add_months(today, 1, 1), 0.5
+    if kind == "day_only":
+        day = next(_day_number(w) for w in words if w[0].isdigit())
+        resolved = date(today.year, today.month, day) if day <= calendar.monthrange(today.year, today.month)[1] else None
+        if resolved is None or resolved < today:
+            resolved = _add_months(today.replace(day=1), 1, day)
+        return resolved, 0.7
+    return None, 0.0
+
+
+def find_dates(text: str, now: datetime = None) -> list[DateResolution]:
+    """Every date expression in `text` that resolves to today or later, in order."""
+    today = (now or datetime.now()).date()
+    found = []
+    for match in GRAMMAR.finditer(text or ""):
+        kind = match.lastgroup
+        try:
+            resolved, confidence = resolve_phrase(kind, match.group(kind).lower(), today)
+        except (ValueError, StopIteration, KeyError):
+            continue
+        if resolved is None or resolved < today:
+            continue
+        clause = _CLAUSE_BREAK.split(text[max(0, match.start() - 40):match.start()])[-1]
+        if _NEGATION.search(clause):
+            confidence *= 0.4
+        found.append(DateResolution(resolved, match.group(kind), round(confidence, 2)))
+    return found
+
+
+def resolve(text: str, now: datetime = None):
+    """
+    Best repayment date in `text` relative to `now` (the call time), or None.
+    The most confident expression wins; among equals the last one said, as
+    customers tend to settle on a date after discussing others.
+    """
+    found = find_dates(text, now)
+    if not found:
+        return None
+    return max(reversed(found), key=lambda resolution: resolution.confidence)
+
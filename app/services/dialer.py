@@ -0,0 +1,364 @@
+import os
+import uuid
+import heapq
+import asyncio
+import logging
+import itertools
+from datetime import datetime, date, timezone
+from dotenv import load_dotenv
+from app.models import CallRequest
+from app.utils import TokenBucket
+from app.services.bland import place_call
+from app.services.resilience import bland_provider, CircuitOpenError
+from app.services.payloads import build_payload
+from app.services import calling_windows
+from app.services.call_store import store, TERMINAL_STATUSES
+from app.services.events import notifier
+from app.services.reconciler import reconciler
+from app.services.leadership import LeaderElection
+
+load_dotenv()
+
+MAX_CONCURRENCY = int(os.getenv("BLAND_MAX_CONCURRENCY", "10"))
+CALLS_PER_SECOND = float(os.getenv("BLAND_CALLS_PER_SECOND", "1"))
+BURST = int(os.getenv("BLAND_BURST", str(MAX_CONCURRENCY)))
+# How often uploads write their progress, and the leader claims new rows and
+# writes placed calls to the store
+FLUSH_INTERVAL = float(os.getenv("DIALER_FLUSH_INTERVAL", "2"))
+# Keep the per-row rejection details bounded for huge sheets; the count is always exact
+MAX_REJECTED_DETAILS = int(os.getenv("INGEST_MAX_REJECTED_DETAILS", "1000"))
+# A batch whose upload is being read holds a lease in the database, renewed on
+# every flush (so keep it well above DIALER_FLUSH_INTERVAL); the batch is only
+# finished once the lease is gone, or has lapsed because the worker stopped
+BATCH_LEASE_SECONDS = float(os.getenv("DIALER_BATCH_LEASE_SECONDS", "30"))
+# How often live calls are checked against the store, for ones that ended on
+# another worker; a call whose end is never seen frees its slot at max_duration
+SLOT_CHECK_INTERVAL = float(os.getenv("DIALER_SLOT_CHECK_INTERVAL", "5"))
+
+
+def plan_calls(contacts: list[CallRequest]):
+    """(priority, earliest call time or None) for each contact; see app.services.calling_windows."""
+    now = datetime.now(timezone.utc)
+    today = date.today()
+    return [(calling_windows.priority(c.due_amount, c.due_date, today), calling_windows.next_call_time(c.phone, now))
+            for c in contacts]
+
+
+class _Batch:
+    """The leader's view of a batch: dial results not yet written to the store."""
+
+    def __init__(self, batch_id: str):
+        self.batch_id = batch_id
+        self.records = []
+        self.dispatched = 0
+        self.failed = 0
+        self.outstanding = 0  # claimed rows not yet dialed and recorded
+
+
+class BulkDialer:
+    """
+    Bulk dialing in two halves. Any worker reads an upload into the dial
+    queue in the store (submit); the elected leader claims queued rows from
+    every worker and dials them (run), so one priority queue and one set of
+    Bland limits cover the whole deployment.
+
+    The leader's queue is ordered by amount owed times days overdue, and each
+    row waits until it is inside its callee's local calling window; a freed
+    slot always goes to the best row that may be called right now. Dialing is
+    bounded by a concurrency limit on live calls (a placed call keeps its slot
+    until it ends) and a token-bucket rate limit matching the Bland quota.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, calls_per_second: float = CALLS_PER_SECOND, burst: int = BURST):
+        self.bucket = TokenBucket(calls_per_second, burst)
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.ready = []  # (-priority, seq, batch, row_id, contact), callable now
+        self.waiting = []  # (call_at, -priority, seq, batch, row_id, contact), outside their calling window
+        self._seq = itertools.count()
+        self._changed = asyncio.Event()
+        self._queued = asyncio.Event()  # set when this worker queues rows, so a local leader claims them at once
+        self._batches = {}  # batch_id -> _Batch with claimed rows
+        self._live = {}  # call_id -> when its slot is freed even if its end is never seen
+        self._calls = set()
+        self._tasks = set()  # one per upload being read
+
+    @property
+    def in_flight(self) -> int:
+        """Calls currently holding a dialing slot, being placed or live."""
+        return self.max_concurrency - self.semaphore._value
+
+    # Reading uploads (every worker)
+
+    async def submit(self, source, cleanup: str = None) -> str:
+        """
+        Queue a batch for dialing in the background and return its id. `source`
+        yields (contacts, rejected) chunks and is read in a worker thread, so a
+        streaming ingester can feed the queue while the file is still being
+        parsed. `cleanup` is a temp file removed once it has been read.
+        """
+        batch_id = uuid.uuid4().hex
+        lease = LeaderElection(f"batch:{batch_id}", ttl=BATCH_LEASE_SECONDS)
+        # Leased before the batch exists, so the leader never finishes it early
+        await asyncio.to_thread(lease.try_acquire)
+        await asyncio.to_thread(store.create_batch, batch_id)
+        task = asyncio.create_task(self._ingest(batch_id, lease, source, cleanup))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return batch_id
+
+    async def stop(self):
+        """Stop reading uploads on shutdown; rows already queued are dialed by the leader."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    @staticmethod
+    async def _write_progress(batch_id: str, progress: dict, **fields):
+        try:
+            await asyncio.to_thread(store.update_batch, batch_id, **progress, **fields)
+            notifier.notify()
+        except Exception:
+            logging.exception(f"Failed to persist progress for batch {batch_id}")
+
+    async def _ingest(self, batch_id: str, lease: LeaderElection, source, cleanup: str = None):
+        progress = {"total": 0, "rejected_count": 0, "rejected": []}
+        chunks = iter(source)
+        error = None
+        flushed_at = asyncio.get_running_loop().time()
+        try:
+            try:
+                while True:
+                    chunk = await asyncio.to_thread(next, chunks, None)
+                    if chunk is None:
+                        break
+                    contacts, rejected = chunk
+                    await asyncio.to_thread(store.queue_rows, batch_id,
+                                            {uuid.uuid4().hex: contact.model_dump_json() for contact in contacts})
+                    self._queued.set()
+                    progress["total"] += len(contacts)
+                    progress["rejected_count"] += len(rejected)
+                    progress["rejected"].extend(rejected[:max(0, MAX_REJECTED_DETAILS - len(progress["rejected"]))])
+                    if asyncio.get_running_loop().time() - flushed_at >= FLUSH_INTERVAL:
+                        flushed_at = asyncio.get_running_loop().time()
+                        await self._write_progress(batch_id, progress)
+                        if not await asyncio.to_thread(lease.try_acquire):
+                            logging.error(f"Lost the upload lease on batch {batch_id}; it may finish before every row is read")
+            except Exception as e:
+                logging.exception(f"Reading bulk batch {batch_id} crashed")
+                error = str(e)
+        except asyncio.CancelledError:
+            error = "The upload was interrupted by a shutdown; rows after the ones counted were not read"
+            raise
+        finally:
+            await self._write_progress(batch_id, progress, error=error)
+            # Without the lease the leader finishes the batch once its queued
+            # rows are dialed
+            try:
+                await asyncio.to_thread(lease.forget)
+            except Exception:
+                logging.exception(f"Failed to drop the upload lease on batch {batch_id}")
+            if cleanup:
+                os.remove(cleanup)
+
+    # Dialing (the leader)
+
+    async def run(self):
+        """Run on the leader: claim queued rows, dial them and finish batches."""
+        claimer = uuid.uuid4().hex
+        tasks = [asyncio.create_task(self._dispatch()), asyncio.create_task(self._watch_live()),
+                 asyncio.create_task(self._sync(claimer))]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Calls being placed finish, so they are recorded rather than lost;
+            # the rows still queued go to the next leader
+            await asyncio.gather(*self._calls, return_exceptions=True)
+            await self._flush()
+            self.ready.clear()
+            self.waiting.clear()
+            self._batches.clear()
+            for call_id in list(self._live):
+                self.call_ended(call_id)
+
+    def call_ended(self, call_id: str):
+        """Free the slot of a placed call once it reaches a terminal status (see pipeline.call_ended_listeners)."""
+        if self._live.pop(call_id, None) is not None:
+            self.semaphore.release()
+
+    async def _watch_live(self):
+        # Webhooks for our calls may land on another worker, so the store is
+        # checked too; calls whose end never shows up give their slot back
+        # once they are past their max_duration
+        while True:
+            await asyncio.sleep(SLOT_CHECK_INTERVAL)
+            try:
+                call_ids = list(self._live)
+                for start in range(0, len(call_ids), 500):
+                    rows = await asyncio.to_thread(store.calls_updated_since, None, None, call_ids[start:start + 500])
+                    for row in rows:
+                        if row["status"] in TERMINAL_STATUSES:
+                            self.call_ended(row["call_id"])
+            except Exception:
+                logging.exception("Failed to check live calls against the store")
+            now = datetime.now()
+            for call_id, expires_at in list(self._live.items()):
+                if expires_at <= now:
+                    logging.warning(f"Call {call_id} never reported an end; freeing its dialing slot")
+                    self.call_ended(call_id)
+
+    async def _sync(self, claimer: str):
+        while True:
+            try:
+                await self._claim(claimer)
+                await self._flush()
+                await self._finish_batches()
+            except Exception:
+                logging.exception("Dial queue sync failed")
+            self._queued.clear()
+            try:
+                await asyncio.wait_for(self._queued.wait(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self, claimer: str):
+        rows = await asyncio.to_thread(store.claim_queued, claimer)
+        if not rows:
+            return
+        contacts = [CallRequest.model_validate_json(row["request"]) for row in rows]
+        plan = await asyncio.to_thread(plan_calls, contacts)
+        now = datetime.now(timezone.utc)
+        for row, contact, (priority, call_at) in zip(rows, contacts, plan):
+            batch = self._batches.get(row["batch_id"])
+            if batch is None:
+                batch = self._batches[row["batch_id"]] = _Batch(row["batch_id"])
+            batch.outstanding += 1
+            if call_at is None:
+                logging.warning(f"No calling window for {contact.phone}; not dialing it")
+                self._spawn(self._dial(batch, row["row_id"], contact, dial=False))
+            elif call_at <= now:
+                heapq.heappush(self.ready, (-priority, next(self._seq), batch, row["row_id"], contact))
+            else:
+                heapq.heappush(self.waiting, (call_at, -priority, next(self._seq), batch, row["row_id"], contact))
+        self._changed.set()
+
+    async def _flush(self):
+        for batch in list(self._batches.values()):
+            pending, batch.records[:] = batch.records[:], []
+            dispatched, failed = batch.dispatched, batch.failed
+            batch.dispatched = batch.failed = 0
+            try:
+                await asyncio.to_thread(store.upsert_calls, pending)
+                await asyncio.to_thread(store.add_batch_counts, batch.batch_id, dispatched, failed)
+                notifier.notify()
+            except Exception:
+                # Keep the results for the next flush rather than losing them;
+                # upserting the records again is harmless
+                batch.records[:0] = pending
+                batch.dispatched += dispatched
+                batch.failed += failed
+                logging.exception(f"Failed to persist progress for batch {batch.batch_id}")
+
+    async def _finish_batches(self):
+        for batch_id in await asyncio.to_thread(store.finishable_batches):
+            batch = self._batches.get(batch_id)
+            if batch is not None and (batch.outstanding or batch.records or batch.dispatched or batch.failed):
+                continue
+            await asyncio.to_thread(store.update_batch, batch_id, done=True)
+            self._batches.pop(batch_id, None)
+            notifier.notify()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._calls.add(task)
+        task.add_done_callback(self._calls.discard)
+
+    def _release_waiting(self, now: datetime):
+        while self.waiting and self.waiting[0][0] <= now:
+            _, neg_priority, seq, batch, row_id, contact = heapq.heappop(self.waiting)
+            heapq.heappush(self.ready, (neg_priority, seq, batch, row_id, contact))
+
+    async def _dispatch(self):
+        while True:
+            self._release_waiting(datetime.now(timezone.utc))
+            if not self.ready:
+                timeout = (self.waiting[0][0] - datetime.now(timezone.utc)).total_seconds() if self.waiting else None
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # Take the slot first, so the pick below is the best row at the
+            # moment a call finishes rather than when it started waiting
+            await self.semaphore.acquire()
+            await self.bucket.acquire()
+            now = datetime.now(timezone.utc)
+            self._release_waiting(now)
+            neg_priority, seq, batch, row_id, contact = heapq.heappop(self.ready)
+            # A long queue can outlast the window the row was released in
+            call_at = calling_windows.next_call_time(contact.phone, now)
+            if call_at != now:
+                self.semaphore.release()
+                if call_at is None:
+                    self._spawn(self._dial(batch, row_id, contact, dial=False))
+                else:
+                    heapq.heappush(self.waiting, (call_at, neg_priority, seq, batch, row_id, contact))
+                continue
+            self._spawn(self._dial(batch, row_id, contact))
+
+    @staticmethod
+    async def _place(payload: dict):
+        # While Bland's circuit is open, rows wait for it instead of all failing
+        while True:
+            await bland_provider.wait_ready()
+            try:
+                return await place_call(payload)
+            except CircuitOpenError as e:
+                # Another row holds the half-open trial; check back shortly
+                await asyncio.sleep(max(e.retry_after, 1.0))
+
+    async def _dial(self, batch: _Batch, row_id: str, contact: CallRequest, dial: bool = True):
+        """
+        Take the row off the dial queue and place its call, holding the slot
+        taken for it; with `dial` False only record it as not dialable.
+        """
+        call_id = None
+        taken = False
+        try:
+            try:
+                # Only whoever removes the row dials it, so rows can't be
+                # dialed twice while leadership changes hands
+                taken = await asyncio.to_thread(store.take_queued, row_id)
+                if taken and dial:
+                    payload = await asyncio.to_thread(build_payload, contact.name, contact.phone, contact.bank_name,
+                                                      contact.voice, contact.tone, contact.due_amount, contact.due_date)
+                    call_id = await self._place(payload)
+            except Exception:
+                logging.exception(f"Call initiation crashed for {contact.phone}")
+                taken = True
+        finally:
+            if call_id:
+                # Held until the call ends, so the limit counts live calls, not requests
+                self._live[call_id] = datetime.now() + reconciler.max_age
+            elif dial:
+                self.semaphore.release()
+        if taken:
+            self._record(batch, contact, call_id, "error" if dial else "no_calling_window")
+        batch.outstanding -= 1
+
+    @staticmethod
+    def _record(batch: _Batch, contact: CallRequest, call_id: str, failure: str = "error"):
+        if call_id:
+            batch.dispatched += 1
+            reconciler.track(call_id)
+            batch.records.append({"call_id": call_id, "batch_id": batch.batch_id, "phone": contact.phone,
+                                  "name": contact.name, "status": "initiating"})
+        else:
+            # Unplaced calls are kept too, so the batch shows which rows failed
+            batch.failed += 1
+            batch.records.append({"call_id": f"unplaced-{uuid.uuid4().hex}", "batch_id": batch.batch_id,
+                                  "phone": contact.phone, "name": contact.name, "status": failure})
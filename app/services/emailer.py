@@ -1,11 +1,32 @@
 import os
+import time
+import queue
+import logging
 import smtplib
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from dotenv import load_dotenv
+from app.services.telemetry import stage, stage_errors, upstream_requests
 
 load_dotenv()
 
-def send_reminder_email(summary, repayment_date):
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "3"))
+SMTP_MAX_RETRIES = int(os.getenv("SMTP_MAX_RETRIES", "3"))
+SMTP_BACKOFF = float(os.getenv("SMTP_BACKOFF", "1"))
+# Local sinks (e.g. aiosmtpd) speak plain SMTP; set SMTP_STARTTLS=false for them
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() != "false"
+# Sessions idle longer than this are checked with NOOP before reuse
+SMTP_IDLE_CHECK = float(os.getenv("SMTP_IDLE_CHECK", "30"))
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError))
+
+
+def build_reminder_message(summary, repayment_date):
     subject = "📬 Loan Repayment Reminder"
     body = f"""Hi,
 
@@ -18,17 +39,111 @@ Repayment Date: {repayment_date}
 
 Thank you,
 Aindriya Bank"""
-    
+
     msg = MIMEText(body)
     msg['Subject'] = subject
     msg['From'] = os.getenv("SMTP_USER")
     msg['To'] = os.getenv("EMAIL_RECIPIENT")
+    return msg
 
-    try:
-        with smtplib.SMTP(os.getenv("SMTP_SERVER"), int(os.getenv("SMTP_PORT", "587"))) as server:
+
+class SMTPPool:
+    """
+    Small pool of authenticated SMTP sessions, so a burst of reminders pays
+    for a handful of TLS handshakes and logins instead of one per email.
+    """
+
+    def __init__(self, size: int = SMTP_POOL_SIZE):
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.slots = queue.Queue()
+        for _ in range(size):
+            self.slots.put(None)
+
+    def _connect(self):
+        server = smtplib.SMTP(os.getenv("SMTP_SERVER"), int(os.getenv("SMTP_PORT", "587")), timeout=30)
+        if SMTP_STARTTLS:
             server.starttls()
+        if os.getenv("SMTP_USER") and os.getenv("SMTP_PASSWORD"):
             server.login(os.getenv("SMTP_USER"), os.getenv("SMTP_PASSWORD"))
-            server.sendmail(msg['From'], msg['To'], msg.as_string())
+        return server
+
+    @staticmethod
+    def _discard(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _checkout(self):
+        while True:
+            try:
+                server, last_used = self.idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < SMTP_IDLE_CHECK:
+                return server
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            self._discard(server)
+
+    @contextmanager
+    def session(self):
+        self.slots.get()
+        server = None
+        try:
+            server = self._checkout()
+            yield server
+        except Exception:
+            # Don't hand a session in an unknown state to the next caller
+            if server is not None:
+                self._discard(server)
+                server = None
+            raise
+        finally:
+            if server is not None:
+                self.idle.put((server, time.monotonic()))
+            self.slots.put(None)
+
+    def close(self):
+        while not self.idle.empty():
+            self._discard(self.idle.get_nowait()[0])
+
+
+pool = SMTPPool()
+
+
+def _send(msg) -> bool:
+    with stage("email"):
+        for attempt in range(SMTP_MAX_RETRIES + 1):
+            try:
+                with pool.session() as server:
+                    server.sendmail(msg['From'], msg['To'], msg.as_string())
+                upstream_requests.inc("smtp", "ok")
+                return True
+            except Exception as e:
+                upstream_requests.inc("smtp", "transient_error" if is_transient(e) else "error")
+                if not is_transient(e) or attempt == SMTP_MAX_RETRIES:
+                    stage_errors.inc("email")
+                    print("❌ Email failed:", e)
+                    return False
+                logging.warning(f"Transient SMTP failure, retrying: {e}")
+                time.sleep(SMTP_BACKOFF * (2 ** attempt))
+
+
+def send_messages(messages: list) -> list[bool]:
+    """Send a batch over the pooled sessions; returns per-message success."""
+    if not messages:
+        return []
+    with ThreadPoolExecutor(max_workers=min(pool.size, len(messages))) as executor:
+        return list(executor.map(_send, messages))
+
+
+def send_reminder_email(summary, repayment_date):
+    sent = _send(build_reminder_message(summary, repayment_date))
+    if sent:
         print("✅ Reminder email sent")
-    except Exception as e:
-        print("❌ Email failed:", e)
+    return sent
@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import asyncio
+from datetime import timedelta
+from dotenv import load_dotenv
+from app.services.call_store import store, TERMINAL_STATUSES
+
+load_dotenv()
+
+# Streams re-read the store this often even without a wake-up, which covers
+# changes written by other workers
+EVENTS_POLL_INTERVAL = float(os.getenv("EVENTS_POLL_INTERVAL", "2"))
+EVENTS_HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+# updated_at is taken before a write commits, so a row can show up after
+# later-stamped ones; each read goes back this far and skips what was sent
+EVENTS_CURSOR_OVERLAP = timedelta(seconds=float(os.getenv("EVENTS_CURSOR_OVERLAP", "10")))
+
+BATCH_FIELDS = ("total", "dispatched", "failed", "rejected_count", "done")
+
+
+class ChangeNotifier:
+    """
+    Wakes live status streams when call state changes. notify() is safe to
+    call from any thread; streams also re-check the store on a timer, so a
+    missed wake-up only adds latency.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._event = None
+
+    def _bind(self):
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+            self._event = asyncio.Event()
+
+    def _fire(self):
+        self._event.set()
+        self._event = asyncio.Event()
+
+    def notify(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._fire)
+
+    async def wait(self, timeout: float):
+        self._bind()
+        event = self._event
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+notifier = ChangeNotifier()
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def status_stream(batch_id: str = None, call_ids: list[str] = None, is_disconnected=None):
+    """
+    Server-Sent Events for one dashboard: a "call" event per status change of
+    the watched calls (first a snapshot, then transitions), a "batch" event
+    when batch progress moves, and "end" once everything is final.
+    """
+    last_status = {}
+    last_batch = None
+    cursor = None
+    last_sent = time.monotonic()
+    while True:
+        if is_disconnected is not None and await is_disconnected():
+            return
+        chunks = []
+        since = cursor - EVENTS_CURSOR_OVERLAP if cursor is not None else None
+        rows = await asyncio.to_thread(store.calls_updated_since, since, batch_id, call_ids)
+        for row in rows:
+            # Rows inside the overlap come back; only real changes go out
+            cursor = row["updated_at"] if cursor is None else max(cursor, row["updated_at"])
+            if last_status.get(row["call_id"]) == row["status"]:
+                continue
+            last_status[row["call_id"]] = row["status"]
+            chunks.append(_sse("call", {
+                "call_id": None if row["call_id"].startswith("unplaced-") else row["call_id"],
+                "name": row["name"], "phone": row["phone"], "status": row["status"],
+            }))
+
+        finished = bool(last_status) and all(status in TERMINAL_STATUSES for status in last_status.values())
+        if batch_id:
+            batch = await asyncio.to_thread(store.get_batch, batch_id)
+            if batch is None:
+                yield _sse("error", {"error": "Unknown batch"})
+                return
+            progress = {field: batch[field] for field in BATCH_FIELDS}
+            if progress != last_batch:
+                last_batch = progress
+                chunks.append(_sse("batch", progress))
+            finished = batch["done"] and (finished or batch["total"] == 0)
+        elif call_ids:
+            finished = finished and len(last_status) == len(set(call_ids))
+
+        if finished:
+            chunks.append(_sse("end", {}))
+        if chunks:
+            yield "".join(chunks)
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= EVENTS_HEARTBEAT:
+            yield ": ping\n\n"
+            last_sent = time.monotonic()
+        if finished:
+            return
+        await notifier.wait(EVENTS_POLL_INTERVAL)
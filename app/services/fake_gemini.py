@@ -0,0 +1,51 @@
+import re
+import json
+import time
+import random
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """
+    Offline stand-in for genai.GenerativeModel, used when GEMINI_MODEL=fake
+    and by the load test and tests. Answers single and batched analysis
+    prompts with canned JSON; latency and error rate are tunable, and `drop`
+    leaves that many calls out of each batched answer, as the model sometimes does.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, repayment_date: str = "2030-01-15", drop: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.repayment_date = repayment_date
+        self.drop = drop
+        self.calls = 0
+        self.prompts = []  # call_ids in each prompt; empty for a single-transcript prompt
+
+    def _analysis(self, call_id: str = None):
+        return {
+            "summary": f"Call {call_id}: customer acknowledged the overdue payment and agreed to pay." if call_id
+                       else "Customer acknowledged the overdue payment and agreed to pay.",
+            "repayment_phrase": "",
+            "repayment_date": self.repayment_date,
+            "issues": "",
+            "amount_due_discussion": {"customer_question": "", "bot_response": ""},
+            "sentiment": {"tone": "Neutral", "topics_discussed": ["repayment"], "problems_raised": []},
+        }
+
+    def generate_content(self, prompt: str, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("429 Resource has been exhausted (fake)")
+        call_ids = re.findall(r"^### CALL (\S+)$", prompt, re.MULTILINE)
+        self.prompts.append(call_ids)
+        if call_ids:
+            # Answered out of order, so callers have to match entries by call_id
+            answered = list(reversed(call_ids[self.drop:]))
+            return FakeResponse(json.dumps([{"call_id": call_id, **self._analysis(call_id)} for call_id in answered]))
+        return FakeResponse(json.dumps(self._analysis()))
@@ -1,49 +1,186 @@
 import os
-import google.generativeai as genai
-from datetime import datetime
-from app.utils import extract_json_from_response
+import re
+import json
+import logging
+import threading
+from collections import Counter
+from pydantic import TypeAdapter, ValidationError
+from app.models import TranscriptAnalysis, BatchTranscriptAnalysis
 from dotenv import load_dotenv
 
 load_dotenv()
 
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-model = genai.GenerativeModel("gemini-2.0-flash")
+# Set GEMINI_MODEL=fake to run the whole pipeline offline
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+# Ask for schema-constrained JSON; set to 0 for models without response_schema support
+GEMINI_STRUCTURED_OUTPUT = os.getenv("GEMINI_STRUCTURED_OUTPUT", "1") != "0"
 
-def analyze_transcript(transcript: str):
-    today = datetime.now().strftime("%Y-%m-%d")
-    prompt = f"""
-You are an AI assistant analyzing a customer support call transcript from a bank. Here is the transcript:
+_model = None
+_model_lock = threading.Lock()
 
-\"\"\"{transcript}\"\"\"
 
-Please extract the following:
-1. Summary of the call.
-2. Any mentioned repayment date (even if relative like "tomorrow", return the actual date in YYYY-MM-DD format).
-3. Issues raised by customer.
-4. Did customer ask about amount due? If yes, what did bot reply?
-5. Sentiment details.
+def get_model():
+    """
+    The configured Gemini model, built on first use: the google.generativeai
+    import alone is most of the app's startup time.
+    """
+    global _model
+    with _model_lock:
+        if _model is None:
+            if GEMINI_MODEL == "fake":
+                from app.services.fake_gemini import FakeGenerativeModel
+                _model = FakeGenerativeModel()
+            else:
+                import google.generativeai as genai
+                genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+                _model = genai.GenerativeModel(GEMINI_MODEL)
+        return _model
 
-Important: Always convert relative dates like "tomorrow" or "next week" into absolute ISO date format (YYYY-MM-DD), assuming the current date is {today}.
 
-Respond in JSON only:
-{{
+RESPONSE_FORMAT = """{
   "summary": "...",
+  "repayment_phrase": "...",
   "repayment_date": "YYYY-MM-DD",
   "issues": "...",
-  "amount_due_discussion": {{
+  "amount_due_discussion": {
     "customer_question": "...",
     "bot_response": "..."
-  }},
-  "sentiment": {{
+  },
+  "sentiment": {
     "tone": "...",
     "topics_discussed": ["..."],
     "problems_raised": ["..."]
-  }}
-}}
+  }
+}"""
+
+INSTRUCTIONS = """Please extract the following:
+1. Summary of the call.
+2. The repayment date the customer committed to, quoted exactly as they said it (e.g. "next Friday", "10 tarikh") in repayment_phrase. Fill repayment_date only if they gave a full calendar date, as YYYY-MM-DD; otherwise leave it empty. Do not work out relative dates yourself.
+3. Issues raised by customer.
+4. Did customer ask about amount due? If yes, what did bot reply?
+5. Sentiment details."""
+
+def build_prompt(transcript: str):
+    return f"""
+You are an AI assistant analyzing a customer support call transcript from a bank. Here is the transcript:
+
+\"\"\"{transcript}\"\"\"
+
+{INSTRUCTIONS}
+
+Respond in JSON only:
+{RESPONSE_FORMAT}
+"""
+
+def build_batch_prompt(items: list[tuple[str, str]]):
+    """Pack several (call_id, transcript) pairs into one prompt."""
+    calls = "\n\n".join(f"### CALL {call_id}\n\"\"\"{transcript}\"\"\"" for call_id, transcript in items)
+    return f"""
+You are an AI assistant analyzing customer support call transcripts from a bank. Each transcript below starts with a "### CALL <call_id>" header:
+
+{calls}
+
+For EACH call, independently:
+{INSTRUCTIONS}
+
+Respond in JSON only: an array with exactly one object per call, each containing a "call_id" field plus this format:
+{RESPONSE_FORMAT}
 """
+
+def response_schema(model_type) -> dict:
+    """
+    Gemini's schema for a pydantic type: the OpenAPI subset it accepts, with
+    $refs inlined, titles and defaults dropped and every property required.
+    """
+    schema = TypeAdapter(model_type).json_schema()
+    defs = schema.get("$defs", {})
+
+    def convert(node):
+        if "$ref" in node:
+            node = defs[node["$ref"].rsplit("/", 1)[1]]
+        out = {"type": node["type"]}
+        if "properties" in node:
+            out["properties"] = {name: convert(prop) for name, prop in node["properties"].items()}
+            out["required"] = list(node["properties"])
+        if "items" in node:
+            out["items"] = convert(node["items"])
+        return out
+
+    return convert(schema)
+
+
+_analysis = TypeAdapter(TranscriptAnalysis)
+_batch = TypeAdapter(list[BatchTranscriptAnalysis])
+
+GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": response_schema(TranscriptAnalysis)}
+BATCH_GENERATION_CONFIG = {"response_mime_type": "application/json", "response_schema": response_schema(list[BatchTranscriptAnalysis])}
+
+# Outcome of every parsed response: "ok" (valid as returned), "repaired" or "failed"
+parse_stats = Counter()
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def _drop_nulls(value):
+    if isinstance(value, dict):
+        return {key: _drop_nulls(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [_drop_nulls(item) for item in value if item is not None]
+    return value
+
+
+def repair_json(text: str, opener: str = "{", closer: str = "}"):
+    """
+    Best-effort load of model output that isn't valid JSON as-is: prose or code
+    fences around it, smart quotes, trailing commas and nulls. Raises ValueError.
+    """
+    start, end = text.find(opener), text.rfind(closer)
+    if start == -1 or end < start:
+        raise ValueError("no JSON value in response")
+    text = text[start:end + 1].replace("\u201c", '"').replace("\u201d", '"')
+    return _drop_nulls(json.loads(_TRAILING_COMMA.sub(r"\1", text)))
+
+
+def parse_analysis(text: str):
+    """Validate one response into a TranscriptAnalysis (repairing it if needed), or None."""
+    try:
+        result = _analysis.validate_json(text)
+        parse_stats["ok"] += 1
+        return result
+    except ValidationError:
+        pass
+    try:
+        result = TranscriptAnalysis.model_validate(repair_json(text))
+        parse_stats["repaired"] += 1
+        return result
+    except (ValueError, ValidationError) as e:
+        parse_stats["failed"] += 1
+        logging.warning(f"Unparseable Gemini analysis ({len(text)} chars): {e}")
+        return None
+
+
+def parse_batch_response(text: str):
+    """Split a batched response back into {call_id: analysis dict}; entries that can't be parsed are left out."""
     try:
-        res = model.generate_content(prompt)
-        return extract_json_from_response(res.text)
-    except Exception as e:
-        print("Gemini error:", e)
-        return {}
+        entries = _batch.validate_json(text)
+        parse_stats["ok"] += 1
+    except ValidationError:
+        entries = []
+        try:
+            raw = repair_json(text, "[", "]")
+        except ValueError:
+            raw = []
+        for item in raw if isinstance(raw, list) else []:
+            try:
+                entries.append(BatchTranscriptAnalysis.model_validate(item))
+            except ValidationError:
+                continue
+        parse_stats["repaired" if entries else "failed"] += 1
+    return {entry.call_id: entry.model_dump(exclude={"call_id"}) for entry in entries}
+
+
+def generation_config(batch: bool = False):
+    if not GEMINI_STRUCTURED_OUTPUT:
+        return None
+    return BATCH_GENERATION_CONFIG if batch else GENERATION_CONFIG
+
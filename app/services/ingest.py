@@ -0,0 +1,157 @@
+import os
+import pandas as pd
+from dotenv import load_dotenv
+from app.models import CallRequest
+from app.utils import normalize_phones
+
+load_dotenv()
+
+REQUIRED_COLUMNS = ["name", "phone", "bank_name", "voice", "tone", "due_amount", "due_date"]
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "5000"))
+# Region assumed for phone numbers written without a country code
+DEFAULT_PHONE_REGION = os.getenv("DEFAULT_PHONE_REGION", "IN")
+
+
+def _csv_chunks(path: str):
+    yield from pd.read_csv(path, chunksize=INGEST_CHUNK_ROWS, dtype=str, keep_default_na=False, encoding="utf-8")
+
+
+def _xlsx_chunks(path: str):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col).strip() if col is not None else "" for col in header]
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == INGEST_CHUNK_ROWS:
+                yield pd.DataFrame(chunk, columns=columns, dtype=object)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns, dtype=object)
+    finally:
+        workbook.close()
+
+
+def _xls_chunks(path: str):
+    # Legacy .xls has no streaming reader; load it once and slice
+    df = pd.read_excel(path, dtype=object)
+    for start in range(0, len(df), INGEST_CHUNK_ROWS):
+        yield df.iloc[start:start + INGEST_CHUNK_ROWS]
+
+
+def _text(series: pd.Series) -> pd.Series:
+    return series.astype(object).where(series.notna(), "").astype(str).str.strip()
+
+
+def _amounts(series: pd.Series) -> pd.Series:
+    cleaned = _text(series).str.replace(r"(?i)^(rs\.?|inr|₹)\s*|,", "", regex=True)
+    numbers = pd.to_numeric(cleaned, errors="coerce")
+    integral = numbers.notna() & (numbers == numbers.round())
+    out = pd.Series("", index=series.index, dtype=object)
+    out[integral] = numbers[integral].astype("int64").astype(str)
+    out[numbers.notna() & ~integral] = numbers[numbers.notna() & ~integral].astype(str)
+    return out
+
+
+def _dates(series: pd.Series) -> pd.Series:
+    raw = series.where(series.notna(), None)
+    parsed = pd.to_datetime(raw, errors="coerce", format="ISO8601")
+    # Fall back to day-first parsing (05/06/2025 -> 5 June) for anything not
+    # year-first; an invalid ISO date like 2025-13-01 stays invalid
+    text = _text(series)
+    retry = parsed.isna() & text.ne("") & ~text.str.match(r"\d{4}[-/.]")
+    if retry.any():
+        parsed[retry] = pd.to_datetime(raw[retry].astype(str), errors="coerce", dayfirst=True, format="mixed")
+    return parsed.dt.strftime("%Y-%m-%d").fillna("")
+
+
+def validate_chunk(df: pd.DataFrame, first_row: int = 2, seen_phones: set = None, region: str = DEFAULT_PHONE_REGION):
+    """
+    Validate and normalize one chunk with column-wise pandas ops. Returns the
+    normalized valid rows as a DataFrame and a list of rejected rows, each with
+    its spreadsheet row number and the reasons it was rejected. `seen_phones`
+    carries numbers accepted from earlier chunks so repeats are dialed once.
+    """
+    df = df.rename(columns=lambda col: str(col).strip().lower())
+    rows = pd.RangeIndex(first_row, first_row + len(df))
+    df.index = rows
+
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        reason = "missing column(s): " + ", ".join(missing_columns)
+        return pd.DataFrame(columns=REQUIRED_COLUMNS), [{"row": int(row), "reasons": [reason]} for row in rows]
+
+    out = pd.DataFrame({
+        "name": _text(df["name"]),
+        "bank_name": _text(df["bank_name"]),
+        "voice": _text(df["voice"]).str.lower(),
+        "tone": _text(df["tone"]).str.lower(),
+        "due_amount": _amounts(df["due_amount"]),
+        "due_date": _dates(df["due_date"]),
+    }, index=rows)
+    out["phone"], valid_phone, _ = normalize_phones(df["phone"], region)
+    out = out[REQUIRED_COLUMNS]
+
+    problems = pd.DataFrame({col: out[col].eq("") for col in REQUIRED_COLUMNS}, index=rows)
+    # Only rows that are otherwise dialable claim a number, so a rejected row
+    # never shadows a later good row with the same phone
+    dialable = valid_phone & ~problems.drop(columns="phone").any(axis=1)
+    duplicate = dialable & out["phone"].where(dialable).duplicated(keep="first")
+    if seen_phones:
+        duplicate |= dialable & out["phone"].isin(seen_phones)
+    problems["phone"] |= duplicate
+    invalid = {
+        "phone": ~valid_phone & _text(df["phone"]).ne(""),
+        "due_amount": problems["due_amount"] & _text(df["due_amount"]).ne(""),
+        "due_date": problems["due_date"] & _text(df["due_date"]).ne(""),
+    }
+    bad = problems.any(axis=1)
+
+    rejected = []
+    for row in bad[bad].index:
+        reasons = []
+        for col in REQUIRED_COLUMNS:
+            if not problems.at[row, col]:
+                continue
+            if col == "phone" and duplicate[row]:
+                reasons.append("duplicate phone")
+            elif col in invalid and invalid[col][row]:
+                reasons.append(f"invalid {col}")
+            else:
+                reasons.append(f"missing {col}")
+        rejected.append({"row": int(row), "reasons": reasons})
+    return out[~bad], rejected
+
+
+def iter_contacts(path: str, filename: str):
+    """
+    Stream an uploaded CSV/XLSX from disk chunk by chunk, yielding
+    (contacts, rejected) per chunk so dialing starts before the file is read.
+    """
+    filename = filename.lower()
+    if filename.endswith(".csv"):
+        chunks = _csv_chunks(path)
+    elif filename.endswith(".xlsx"):
+        chunks = _xlsx_chunks(path)
+    elif filename.endswith(".xls"):
+        chunks = _xls_chunks(path)
+    else:
+        raise ValueError("Unsupported file format")
+
+    first_row = 2  # row 1 is the header
+    seen_phones = set()
+    for chunk in chunks:
+        valid, rejected = validate_chunk(chunk, first_row, seen_phones)
+        seen_phones.update(valid["phone"])
+        first_row += len(chunk)
+        yield [CallRequest(**record) for record in valid.to_dict("records")], rejected
+
+
+def is_supported(filename: str) -> bool:
+    return filename.lower().endswith((".csv", ".xlsx", ".xls"))
@@ -0,0 +1,110 @@
+import os
+import uuid
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import update, delete, or_
+from sqlalchemy.exc import IntegrityError
+from dotenv import load_dotenv
+from app.db import engine, leases
+
+load_dotenv()
+
+# A leader that stops renewing (crashed, hung, lost the database) is replaced
+# after this long; it renews three times per period
+LEADER_LEASE_SECONDS = float(os.getenv("LEADER_LEASE_SECONDS", "30"))
+
+
+class LeaderElection:
+    """
+    Elects one leader among the app's worker processes (uvicorn --workers,
+    several hosts) through a lease row in the shared database. Every worker
+    runs this; the one holding the lease runs `on_elected`, and `on_demoted`
+    as soon as a renewal fails, before the lease can pass to another worker.
+    If `on_elected` fails the lease is released for another worker (or a
+    later attempt) to take.
+    Worker clocks are assumed to be in sync to well within the lease.
+    """
+
+    def __init__(self, name: str, on_elected=None, on_demoted=None, ttl: float = LEADER_LEASE_SECONDS):
+        self.name = name
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.ttl = timedelta(seconds=ttl)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    def try_acquire(self) -> bool:
+        """Take the lease if it is free or expired, or renew it if we hold it."""
+        now = datetime.now()
+        with engine.begin() as conn:
+            taken = conn.execute(
+                update(leases)
+                .where(leases.c.name == self.name, or_(leases.c.holder == self.holder, leases.c.expires_at < now))
+                .values(holder=self.holder, expires_at=now + self.ttl)
+            ).rowcount
+        if taken:
+            return True
+        try:
+            with engine.begin() as conn:
+                conn.execute(leases.insert().values(name=self.name, holder=self.holder, expires_at=now + self.ttl))
+        except IntegrityError:
+            return False
+        return True
+
+    def release(self):
+        """Expire our lease so another worker takes over without waiting it out."""
+        with engine.begin() as conn:
+            conn.execute(update(leases).where(leases.c.name == self.name, leases.c.holder == self.holder)
+                         .values(expires_at=datetime.now()))
+
+    def forget(self):
+        """Delete our lease row, for one-off leases that nobody will take again."""
+        with engine.begin() as conn:
+            conn.execute(delete(leases).where(leases.c.name == self.name, leases.c.holder == self.holder))
+
+    async def _set_leader(self, leader: bool):
+        if leader == self.is_leader:
+            return
+        if not leader:
+            self.is_leader = False
+            logging.info(f"Worker {self.holder} is no longer the {self.name} leader")
+            if self.on_demoted is not None:
+                try:
+                    await self.on_demoted()
+                except Exception:
+                    logging.exception(f"Stepping down as {self.name} leader failed")
+            return
+        try:
+            if self.on_elected is not None:
+                await self.on_elected()
+        except Exception:
+            # Holding the lease without doing the leader's work would stall every worker
+            logging.exception(f"Taking over as {self.name} leader failed; releasing the lease")
+            try:
+                await asyncio.to_thread(self.release)
+            except Exception:
+                logging.exception(f"Failed to release the {self.name} lease")
+            return
+        self.is_leader = True
+        logging.info(f"Worker {self.holder} is now the {self.name} leader")
+
+    async def run(self):
+        try:
+            while True:
+                try:
+                    leader = await asyncio.to_thread(self.try_acquire)
+                except Exception:
+                    # Can't tell whether the lease still holds; step down to be safe
+                    logging.exception(f"Failed to renew the {self.name} lease")
+                    leader = False
+                await self._set_leader(leader)
+                await asyncio.sleep(self.ttl.total_seconds() / 3)
+        finally:
+            if self.is_leader:
+                await self._set_leader(False)
+                try:
+                    await asyncio.to_thread(self.release)
+                except Exception:
+                    logging.exception(f"Failed to release the {self.name} lease")
@@ -0,0 +1,154 @@
+from datetime import datetime
+from functools import lru_cache
+from app.utils import normalize_phone
+
+
+@lru_cache(maxsize=None)
+def number_words():
+    """
+    Utility to convert number to readable words (e.g., 2000 -> two thousand).
+    Built on first use; importing inflect takes seconds.
+    """
+    import inflect
+    return inflect.engine()
+
+
+TONE_MAP = {
+    "soft": "soft and polite",
+    "neutral": "neutral and professional",
+    "firm": "firm and direct",
+    "assertive": "assertive and insistent",
+    "harsh": "harsh and demanding"
+}
+
+# Frontend voice selection -> Bland AI voice ID
+VOICE_MAPPING = {
+    # Custom voice
+    "shashi": "shashi",  # Your custom cloned voice ID
+
+    # Bland AI Female voices
+    "adriana": "adriana",
+    "evelyn": "evelyn",
+    "june": "june",
+    "maya": "maya",
+    "ruth": "ruth",
+
+    # Bland AI Male voices
+    "brady": "brady",
+    "karl": "karl",
+    "mason": "mason",
+    "public - hank (boss)": "public - hank (boss)"
+}
+
+BASE_PAYLOAD = {
+    "wait_for_greeting": False,
+    "record": True,
+    "answered_by_enabled": True,
+    "noise_cancellation": True,
+    "interruption_threshold": 100,
+    "block_interruptions": False,
+    "max_duration": 12,
+    "model": "base",
+    "language": "en",
+    "background_track": "office",
+    "voicemail_action": "hangup",
+}
+
+# {bank_name} and {tone_style} are filled once per campaign template;
+# {name}, {formatted_amount} and {formatted_due_date} once per call
+TASK_TEMPLATE = """
+Goal: Call customers to remind them of their overdue loan payment. Confirm when they can make the payment, assess their willingness and financial condition, and warn about consequences if they refuse or delay.
+
+Your speaking style should be {tone_style}. Be consistent with this tone throughout the conversation.
+
+Call Flow:
+
+1. Greet the person and ask, "Am I speaking with {name}?"
+2. If the person says **yes**:
+    - Introduce yourself as an assistant from {bank_name}.
+    - Inform them that their recent loan payment of {formatted_amount} was due on {formatted_due_date} and is currently overdue.
+    - Ask when they will be able to make the payment.
+    - If they give vague responses, excuses, or delay:
+        - Ask about their current financial condition.
+        - Clarify whether they genuinely can't pay or are unwilling to pay.
+        - Ask for the earliest possible date they can repay.
+    - If they continue avoiding payment or provide unreasonable excuses:
+        - Warn that legal action may be initiated.
+        - Inform that their CIBIL score will be negatively affected.
+        - State that recovery agents may be sent to their registered address.
+    - Be {tone_style}. Do not accept vague answers.
+    - Repeat the urgency and consequences until a concrete response is received.
+    - End the call by summarizing the discussed repayment date and thanking them.
+
+3. If the person says **no**:
+    - Politely ask who you are speaking with.
+    - Ask if they are related to or can help you contact {name}.
+    - If they confirm a relationship (e.g., family), politely ask them to pass on the message that there is an overdue loan payment and the bank is trying to reach {name}.
+    - If they are not related or unsure, thank them and end the call.
+
+Background:
+
+I am an AI assistant created by {bank_name} to follow up on overdue loan repayments. Ensuring timely recovery protects the customer's credit history and supports the bank’s financial operations. This call is a formal reminder and may lead to further action in case of continued non-compliance.
+"""
+
+FIRST_SENTENCE_TEMPLATE = "Hello, this is {bank_name} calling. Am I speaking with {name}?"
+
+CACHE_SIZE = 4096
+
+
+def get_voice_id(voice: str):
+    """
+    Map frontend voice selection to Bland AI voice IDs
+    Handle both custom voices and standard Bland AI voices
+    """
+    # Return the mapped voice or default to the custom voice
+    return VOICE_MAPPING.get(voice, "shashi")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def format_amount_readable(amount):
+    try:
+        return number_words().number_to_words(int(amount), andword="").replace(",", "")
+    except:
+        return str(amount)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def format_date_readable(date_str):
+    try:
+        dt = datetime.strptime(date_str, "%Y-%m-%d")
+        return dt.strftime("%B %d, %Y")  # e.g., "June 1, 2025"
+    except:
+        return date_str
+
+
+def _escape(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+@lru_cache(maxsize=256)
+def compile_template(bank_name: str, tone: str, voice: str):
+    """
+    Fill the per-campaign parts of the call payload once for each
+    (bank, tone, voice); returns (task, first_sentence, base_payload) with
+    only the per-call placeholders left in the strings.
+    """
+    fixed = {"bank_name": _escape(bank_name), "tone_style": TONE_MAP.get(tone, "neutral and professional")}
+    task = TASK_TEMPLATE.format(name="{name}", formatted_amount="{formatted_amount}", formatted_due_date="{formatted_due_date}", **fixed)
+    first_sentence = FIRST_SENTENCE_TEMPLATE.format(name="{name}", **fixed)
+    return task, first_sentence, {**BASE_PAYLOAD, "voice": get_voice_id(voice)}
+
+
+def build_payload(name: str, phone: str, bank_name: str, voice: str, tone: str, due_amount: str, due_date: str):
+    task, first_sentence, base = compile_template(bank_name, tone, voice)
+    fields = {
+        "name": name,
+        "formatted_amount": format_amount_readable(due_amount) + " rupees",
+        "formatted_due_date": format_date_readable(due_date),
+    }
+    return {
+        "phone_number": normalize_phone(phone),
+        **base,
+        "task": task.format(**fields),
+        "first_sentence": first_sentence.format(name=name),
+    }
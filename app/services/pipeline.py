@@ -0,0 +1,151 @@
+import os
+import asyncio
+import logging
+from datetime import datetime, date
+from dotenv import load_dotenv
+from app.services.analysis_queue import analysis_queue
+from app.services import reminders, preanalysis, dates
+from app.services.reminder_planner import plan_send_time
+from app.services.analysis_cache import transcript_hash, get_analysis, save_analysis, mark_failed
+from app.services.call_store import store, TERMINAL_STATUSES
+from app.services.supabase_sink import sink
+from app.services.events import notifier
+from app.services.telemetry import registry, stage, stage_errors
+
+load_dotenv()
+
+# Dates resolved with less confidence than this (e.g. negated ones) get no reminder
+REPAYMENT_DATE_MIN_CONFIDENCE = float(os.getenv("REPAYMENT_DATE_MIN_CONFIDENCE", "0.5"))
+
+# call_id -> running analysis task, so concurrent updates share one LLM call
+_inflight = {}
+# Called with the call_id whenever a call is reported in a terminal status
+call_ended_listeners = []
+
+
+def track_call(call_id: str, phone: str = None, name: str = None, batch_id: str = None):
+    store.upsert_calls([{"call_id": call_id, "phone": phone, "name": name, "batch_id": batch_id}])
+    notifier.notify()
+
+
+def get_status(call_id: str):
+    call = store.get_call(call_id)
+    return call["status"] if call else None
+
+
+def resolve_repayment_date(gemini_data: dict, transcript: str, call_time: datetime):
+    """
+    Pin the repayment date locally against the call time: the customer's own
+    words as quoted by Gemini first, then the transcript, then a full calendar
+    date Gemini read out. Sets repayment_date (ISO) and its confidence.
+    """
+    phrase = gemini_data.get("repayment_phrase")
+    resolution = dates.resolve(phrase, call_time) if phrase else None
+    if resolution is None:
+        resolution = preanalysis.customer_repayment_date(transcript, call_time)
+    if resolution is None and gemini_data.get("repayment_date"):
+        resolution = dates.resolve(gemini_data["repayment_date"], call_time)
+    gemini_data["repayment_date"] = resolution.date.isoformat() if resolution else ""
+    gemini_data["repayment_date_confidence"] = resolution.confidence if resolution else 0.0
+    return gemini_data
+
+
+def schedule_reminder(call_id: str, gemini_data: dict):
+    repayment_raw = gemini_data.get("repayment_date")
+    if repayment_raw and gemini_data.get("repayment_date_confidence", 1.0) >= REPAYMENT_DATE_MIN_CONFIDENCE:
+        try:
+            now = datetime.now()
+            # Spread across the send window with per-call jitter instead of 09:00 sharp
+            dt = plan_send_time(call_id, date.fromisoformat(repayment_raw), not_before=now)
+            if dt > now:
+                # The reminders table allows one reminder per call
+                reminders.schedule_reminder(call_id, dt, gemini_data.get("summary", ""), repayment_raw)
+        except Exception as e:
+            stage_errors.inc("schedule")
+            print("❌ Date parse error:", e)
+
+
+async def process_transcript(call_id: str, transcript: str):
+    """
+    Analyze a completed call's transcript and schedule its reminder. The result
+    is persisted per call and transcript hash, so repeat calls skip Gemini;
+    voicemails, wrong numbers and similar trivial calls never reach it.
+    Failures are recorded with the transcript, and the reconciler retries them.
+    """
+    try:
+        result = await _analyze_and_schedule(call_id, transcript)
+    except Exception:
+        await asyncio.to_thread(mark_failed, call_id, transcript)
+        raise
+    if not result:
+        await asyncio.to_thread(mark_failed, call_id, transcript)
+    return result
+
+
+async def _analyze_and_schedule(call_id: str, transcript: str):
+    digest = transcript_hash(transcript)
+    cached = await asyncio.to_thread(get_analysis, call_id, digest)
+    if cached is not None:
+        return cached
+    with stage("preanalysis"):
+        _, gemini_data = await asyncio.to_thread(preanalysis.preanalyze, transcript)
+    if gemini_data is None:
+        # Includes time spent queued for a Gemini worker; the bare request is the "gemini" stage
+        with stage("analysis"):
+            gemini_data = await analysis_queue.analyze(call_id, transcript)
+        if not gemini_data:
+            stage_errors.inc("analysis")
+            return {}
+        call = await asyncio.to_thread(store.get_call, call_id)
+        with stage("date_parse"):
+            resolve_repayment_date(gemini_data, transcript, call["created_at"] if call else datetime.now())
+    await asyncio.to_thread(save_analysis, call_id, digest, gemini_data)
+    with stage("schedule"):
+        await asyncio.to_thread(schedule_reminder, call_id, gemini_data)
+    return gemini_data
+
+
+def _record_transition(call_id: str, status: str):
+    """Store the status; returns the call as it was before, or None if it is new."""
+    previous = store.get_call(call_id)
+    store.upsert_calls([{"call_id": call_id, "status": status}])
+    return previous
+
+
+async def handle_call_update(call_id: str, status: str, transcript: str = "", recording_url: str = None):
+    """
+    Record a status change for a call (from the webhook, the reconciler or a
+    status poll) and return the transcript analysis once the call completes.
+    """
+    previous = await asyncio.to_thread(_record_transition, call_id, status)
+    changed = previous is None or previous["status"] != status
+    if changed:
+        notifier.notify()
+    if status in TERMINAL_STATUSES:
+        for listener in call_ended_listeners:
+            listener(call_id)
+    if sink is not None and status in TERMINAL_STATUSES and changed:
+        sink.add({
+            "call_id": call_id,
+            "phone_number": (previous or {}).get("phone") or "",
+            "status": status,
+            "transcript": transcript,
+            "recording_url": recording_url,
+            "created_at": datetime.utcnow().isoformat(),
+        })
+    if status != "completed" or not transcript:
+        return None
+    task = _inflight.get(call_id)
+    if task is None:
+        task = asyncio.create_task(process_transcript(call_id, transcript))
+        _inflight[call_id] = task
+        task.add_done_callback(lambda _: _inflight.pop(call_id, None))
+    try:
+        return await asyncio.shield(task)
+    except Exception:
+        logging.exception(f"Transcript processing failed for {call_id}")
+        return None
+
+
+registry.gauge("analyses_in_flight", "Completed calls whose transcript is being processed", lambda: len(_inflight))
+
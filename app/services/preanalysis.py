@@ -0,0 +1,135 @@
+import os
+import re
+import logging
+from collections import Counter
+from datetime import datetime
+from dotenv import load_dotenv
+from app.services import dates
+from app.services.telemetry import registry
+
+load_dotenv()
+
+# Calls where the customer said fewer words than this never became a conversation
+PREANALYSIS_MIN_USER_WORDS = int(os.getenv("PREANALYSIS_MIN_USER_WORDS", "4"))
+# Optional Hugging Face zero-shot model for transcripts the rules can't settle,
+# e.g. "typeform/distilbert-base-uncased-mnli"; unset keeps pre-analysis rule-only
+PREANALYSIS_MODEL = os.getenv("PREANALYSIS_MODEL", "")
+PREANALYSIS_MODEL_THRESHOLD = float(os.getenv("PREANALYSIS_MODEL_THRESHOLD", "0.8"))
+
+_SPEAKER = re.compile(r"^\s*(user|customer|assistant|agent|bot)\s*:\s*", re.I | re.M)
+_VOICEMAIL = re.compile(
+    r"leave (?:a|your) message|voice ?mail|after the (?:tone|beep)|mailbox|is not available right now|"
+    r"the (?:number|subscriber) you (?:have )?(?:dialed|called)|switched off|not reachable|out of coverage",
+    re.I,
+)
+_WRONG_NUMBER = re.compile(
+    r"wrong number|no one (?:here )?(?:by|with) that name|(?:don't|do not) know (?:any|who|him|her|this person)|"
+    r"not (?:my|the) (?:name|account)|you have the wrong",
+    re.I,
+)
+
+stats = Counter()
+registry.gauge("preanalysis_total", "Completed calls by local classification", lambda: stats, "kind", kind="counter")
+
+_classifier = None
+_classifier_failed = False
+
+LABELS = {"voicemail": "an answering machine or voicemail greeting",
+          "wrong_number": "a wrong number or the wrong person",
+          "substantive": "a conversation about a loan repayment"}
+
+
+def split_turns(transcript: str):
+    """(speaker, text) turns of a Bland concatenated transcript; speakerless text counts as the user."""
+    parts = _SPEAKER.split(transcript or "")
+    turns = [("user", parts[0].strip())] if parts[0].strip() else []
+    for speaker, text in zip(parts[1::2], parts[2::2]):
+        speaker = "user" if speaker.lower() in ("user", "customer") else "assistant"
+        if text.strip():
+            turns.append((speaker, text.strip()))
+    return turns
+
+
+def _model_label(transcript: str):
+    """Zero-shot label from PREANALYSIS_MODEL, or None when unavailable or unsure."""
+    global _classifier, _classifier_failed
+    if not PREANALYSIS_MODEL or _classifier_failed:
+        return None
+    if _classifier is None:
+        try:
+            from transformers import pipeline
+            _classifier = pipeline("zero-shot-classification", model=PREANALYSIS_MODEL)
+        except Exception:
+            logging.exception(f"Could not load pre-analysis model {PREANALYSIS_MODEL}; using rules only")
+            _classifier_failed = True
+            return None
+    result = _classifier(transcript[:2000], candidate_labels=list(LABELS.values()))
+    if result["scores"][0] < PREANALYSIS_MODEL_THRESHOLD:
+        return None
+    return next(label for label, text in LABELS.items() if text == result["labels"][0])
+
+
+def classify(transcript: str) -> str:
+    """
+    "empty", "voicemail", "wrong_number", "no_response" or "substantive".
+    Rules run first; the optional model only sees calls they can't decide.
+    A customer who mentions a date always gets the full analysis.
+    """
+    turns = split_turns(transcript)
+    if not turns:
+        return "empty"
+    user_text = " ".join(text for speaker, text in turns if speaker == "user")
+    if dates.find_dates(user_text):
+        return "substantive"
+    user_words = len(user_text.split())
+    # Phrases like "switched off" also come up later in real conversations
+    # ("my phone was switched off"), so the phrase rules only look at what the
+    # customer said first, and only when they said little in all
+    first_reply = next(text for speaker, text in turns if speaker == "user") if user_words else ""
+    if user_words < 40 and _WRONG_NUMBER.search(first_reply):
+        return "wrong_number"
+    if user_words < 60 and _VOICEMAIL.search(first_reply):
+        # A voicemail greeting is transcribed as the customer's speech
+        return "voicemail"
+    if user_words < PREANALYSIS_MIN_USER_WORDS:
+        return "no_response"
+    return _model_label(transcript) or "substantive"
+
+
+SUMMARIES = {
+    "empty": "No transcript was recorded for this call.",
+    "voicemail": "The call reached voicemail; no conversation took place.",
+    "wrong_number": "The person who answered said it was a wrong number.",
+    "no_response": "The customer did not engage in a conversation.",
+}
+
+
+def preanalyze(transcript: str):
+    """
+    Cheap local pass over a completed call. Returns (kind, analysis):
+    `analysis` is a complete result in the Gemini format for trivial calls,
+    or None when the call needs full analysis. `kind` is the classification.
+    """
+    kind = classify(transcript)
+    stats[kind] += 1
+    if kind == "substantive":
+        return kind, None
+    return kind, {
+        "summary": SUMMARIES[kind],
+        "repayment_date": "",
+        "issues": "",
+        "amount_due_discussion": {"customer_question": "", "bot_response": ""},
+        "sentiment": {"tone": "Neutral", "topics_discussed": [], "problems_raised": []},
+        "preanalysis": kind,
+    }
+
+
+def customer_repayment_date(transcript: str, now: datetime = None):
+    """Repayment date the customer stated, as a dates.DateResolution relative to `now`, or None."""
+    user_text = " ".join(text for speaker, text in split_turns(transcript) if speaker == "user")
+    return dates.resolve(user_text, now)
+
+
+def metrics() -> dict:
+    total = sum(stats.values())
+    return {**stats, "total": total, "skipped_llm": total - stats["substantive"]}
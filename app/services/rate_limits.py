@@ -0,0 +1,52 @@
+import time
+import asyncio
+from sqlalchemy import select, update, case
+from sqlalchemy.exc import IntegrityError
+from app.db import engine, rate_limits
+
+
+class SharedTokenBucket:
+    """
+    Token bucket kept in the database, so every worker process draws from
+    the same `rate` tokens per second up to `capacity`. Same interface as
+    app.utils.TokenBucket; each acquire() is one short transaction. Worker
+    clocks are assumed to be in sync, as for the leader lease.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: int):
+        self.name = name
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.lock = asyncio.Lock()
+
+    def _take(self) -> float:
+        """Take a token if one is available; otherwise seconds until the next one refills."""
+        now = time.time()
+        refilled = rate_limits.c.tokens + (now - rate_limits.c.updated_at) * self.rate
+        tokens = case((refilled > self.capacity, self.capacity), else_=refilled)
+        with engine.begin() as conn:
+            taken = conn.execute(update(rate_limits).where(rate_limits.c.name == self.name, tokens >= 1)
+                                 .values(tokens=tokens - 1, updated_at=now)).rowcount
+            if taken:
+                return 0.0
+            row = conn.execute(select(rate_limits.c.tokens, rate_limits.c.updated_at)
+                               .where(rate_limits.c.name == self.name)).first()
+        if row is None:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(rate_limits.insert().values(name=self.name, tokens=self.capacity - 1, updated_at=now))
+                return 0.0
+            except IntegrityError:
+                # Another worker created the bucket first; draw from it
+                return self._take()
+        available = min(self.capacity, row.tokens + (now - row.updated_at) * self.rate)
+        return max((1 - available) / self.rate, 0.01)
+
+    async def acquire(self):
+        # Callers in this process queue on the lock, so only one of them polls the database
+        async with self.lock:
+            while True:
+                wait = await asyncio.to_thread(self._take)
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
@@ -0,0 +1,185 @@
+import os
+import heapq
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from app.services.bland import check_bland_call_status, WEBHOOK_URL
+from app.services.payloads import BASE_PAYLOAD
+from app.services.call_store import store, TERMINAL_STATUSES
+from app.services import pipeline
+from app.services.analysis_cache import due_retries
+from app.services.telemetry import registry
+
+load_dotenv()
+
+# Poll interval grows with call age: RECONCILE_AGE_FACTOR * age, clamped to [min, max]
+RECONCILE_MIN_INTERVAL = float(os.getenv("RECONCILE_MIN_INTERVAL", "5"))
+RECONCILE_MAX_INTERVAL = float(os.getenv("RECONCILE_MAX_INTERVAL", "60"))
+RECONCILE_AGE_FACTOR = float(os.getenv("RECONCILE_AGE_FACTOR", "0.1"))
+RECONCILE_BATCH_SIZE = int(os.getenv("RECONCILE_BATCH_SIZE", "100"))
+RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "20"))
+# How often in-flight calls are reloaded from the store (restarts, other workers)
+RECONCILE_RESYNC_INTERVAL = float(os.getenv("RECONCILE_RESYNC_INTERVAL", "30"))
+# With webhooks on, the first poll waits this long for the webhook to arrive
+WEBHOOK_GRACE_SECONDS = float(os.getenv("BLAND_WEBHOOK_GRACE", "900")) if WEBHOOK_URL else 0.0
+# Calls are given up on once they are older than their max_duration plus queueing/ringing time
+CALL_MAX_DURATION = float(os.getenv("CALL_MAX_DURATION", str(BASE_PAYLOAD["max_duration"] * 60)))
+RECONCILE_SLACK = float(os.getenv("RECONCILE_SLACK", "300"))
+
+
+def poll_delay(age: float) -> float:
+    """Seconds until the next status poll for a call that is `age` seconds old."""
+    return min(RECONCILE_MAX_INTERVAL, max(RECONCILE_MIN_INTERVAL, age * RECONCILE_AGE_FACTOR))
+
+
+class Reconciler:
+    """
+    Tracks every non-terminal call and polls Bland for them in bounded
+    concurrent batches, fast while a call is young and slower as it ages,
+    until it ends or outlives CALL_MAX_DURATION. Transitions go to the
+    analysis pipeline, and completed calls whose analysis failed are
+    re-analyzed on the resync timer. Thousands of calls cost one heap entry each.
+    With several workers only the elected leader runs it; the others
+    leave their calls to its resync from the store.
+    """
+
+    def __init__(self, batch_size: int = RECONCILE_BATCH_SIZE, concurrency: int = RECONCILE_CONCURRENCY):
+        self.batch_size = batch_size
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.calls = {}  # call_id -> {"created_at", "status", "due"}
+        self.heap = []  # (due, call_id); entries whose due no longer matches are stale
+        self.wakeup = None
+        self._tasks = set()
+        self.stats = {"polls": 0, "transitions": 0, "expired": 0, "errors": 0, "analysis_retries": 0}
+
+    @property
+    def max_age(self) -> timedelta:
+        return timedelta(seconds=CALL_MAX_DURATION + RECONCILE_SLACK)
+
+    def _schedule(self, call_id: str, due: datetime):
+        self.calls[call_id]["due"] = due
+        heapq.heappush(self.heap, (due, call_id))
+
+    def track(self, call_id: str, created_at: datetime = None, status: str = "initiating"):
+        if self.wakeup is None or call_id in self.calls or status in TERMINAL_STATUSES:
+            return
+        created_at = created_at or datetime.now()
+        self.calls[call_id] = {"created_at": created_at, "status": status, "due": None}
+        age = (datetime.now() - created_at).total_seconds()
+        first = max(WEBHOOK_GRACE_SECONDS - age, poll_delay(age))
+        self._schedule(call_id, datetime.now() + timedelta(seconds=first))
+        self.wakeup.set()
+
+    def forget(self, call_id: str):
+        self.calls.pop(call_id, None)
+
+    def metrics(self) -> dict:
+        return {"tracked": len(self.calls), **self.stats}
+
+    async def resync(self):
+        pending = await asyncio.to_thread(store.pending_calls, since=datetime.now() - self.max_age, limit=None)
+        for call in pending:
+            self.track(call["call_id"], call["created_at"], call["status"])
+
+    def _spawn(self, coro):
+        # Analysis can take a while; don't hold up the rest of the batch
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def retry_analyses(self):
+        # handle_call_update shares one task per call, so a retry still
+        # running from the last pass isn't started twice
+        for call_id, transcript in await asyncio.to_thread(due_retries, self.batch_size):
+            self.stats["analysis_retries"] += 1
+            self._spawn(pipeline.handle_call_update(call_id, "completed", transcript))
+
+    def _take_due(self) -> list[str]:
+        now = datetime.now()
+        due = []
+        while self.heap and self.heap[0][0] <= now and len(due) < self.batch_size:
+            when, call_id = heapq.heappop(self.heap)
+            call = self.calls.get(call_id)
+            if call is not None and call["due"] == when:
+                due.append(call_id)
+        return due
+
+    async def _poll_one(self, call_id: str):
+        async with self.semaphore:
+            status, transcript = await check_bland_call_status(call_id)
+        self.stats["polls"] += 1
+        call = self.calls.get(call_id)
+        if call is None:
+            return
+        if not status or status == "error":
+            self.stats["errors"] += 1
+        elif status != call["status"]:
+            call["status"] = status
+            self.stats["transitions"] += 1
+            self._spawn(pipeline.handle_call_update(call_id, status, transcript))
+        self._reschedule(call_id)
+
+    def _reschedule(self, call_id: str):
+        call = self.calls[call_id]
+        age = datetime.now() - call["created_at"]
+        if call["status"] in TERMINAL_STATUSES:
+            self.forget(call_id)
+        elif age > self.max_age:
+            self.forget(call_id)
+            self.stats["expired"] += 1
+            logging.warning(f"Giving up on call {call_id}: still {call['status']} after {int(age.total_seconds())}s")
+        else:
+            self._schedule(call_id, datetime.now() + timedelta(seconds=poll_delay(age.total_seconds())))
+
+    async def poll_batch(self, call_ids: list[str]):
+        # Webhooks (or another worker) may have settled some calls since they were queued
+        try:
+            rows = await asyncio.to_thread(store.calls_updated_since, None, None, call_ids)
+            known = {row["call_id"]: row["status"] for row in rows}
+        except Exception:
+            logging.exception("Failed to read call statuses; polling Bland for all of them")
+            known = {}
+        live = []
+        for call_id in call_ids:
+            if call_id in known:
+                self.calls[call_id]["status"] = known[call_id]
+            if self.calls[call_id]["status"] in TERMINAL_STATUSES:
+                self.forget(call_id)
+            else:
+                live.append(call_id)
+        await asyncio.gather(*(self._poll_one(call_id) for call_id in live))
+
+    async def run(self):
+        self.wakeup = asyncio.Event()
+        next_resync = datetime.now()
+        try:
+            while True:
+                try:
+                    if datetime.now() >= next_resync:
+                        next_resync = datetime.now() + timedelta(seconds=RECONCILE_RESYNC_INTERVAL)
+                        await self.resync()
+                        await self.retry_analyses()
+                    due = self._take_due()
+                    if due:
+                        await self.poll_batch(due)
+                        continue
+                except Exception:
+                    logging.exception("Reconciler pass failed")
+                wake_at = min(self.heap[0][0], next_resync) if self.heap else next_resync
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), max(0.0, (wake_at - datetime.now()).total_seconds()))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Calls are only tracked while running; the next run reloads them from the store
+            self.wakeup = None
+            self.calls.clear()
+            self.heap.clear()
+
+
+reconciler = Reconciler()
+
+registry.gauge("reconciler_tracked_calls", "In-flight calls the reconciler is polling", lambda: len(reconciler.calls))
+registry.gauge("reconciler_total", "Reconciler totals", lambda: reconciler.stats, "event", kind="counter")
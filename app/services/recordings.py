@@ -0,0 +1,207 @@
+import os
+import re
+import json
+import random
+import asyncio
+import logging
+from urllib.parse import urlparse
+import httpx
+from dotenv import load_dotenv
+from app.services.bland import headers as bland_headers, BLAND_API_BASE, BLAND_CONNECT_TIMEOUT, get_call_details
+from app.services.telemetry import registry
+
+load_dotenv()
+
+RECORDINGS_DIR = os.getenv("RECORDINGS_DIR", "recordings")
+RECORDING_CONCURRENCY = int(os.getenv("RECORDING_CONCURRENCY", "4"))
+RECORDING_CHUNK_SIZE = int(os.getenv("RECORDING_CHUNK_SIZE", str(64 * 1024)))
+RECORDING_MAX_RETRIES = int(os.getenv("RECORDING_MAX_RETRIES", "3"))
+RECORDING_BACKOFF = float(os.getenv("RECORDING_BACKOFF", "1"))
+RECORDING_TIMEOUT = float(os.getenv("RECORDING_TIMEOUT", "60"))
+
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class RecordingFetcher:
+    """
+    Streams call recordings to RECORDINGS_DIR in fixed-size chunks, so memory
+    stays flat however long the audio is. Each recording is stored as
+    <call_id>.mp3 with a <call_id>.json sidecar holding its ETag and size;
+    complete files are skipped and interrupted ones resume with a Range request.
+    """
+
+    def __init__(self, directory: str = RECORDINGS_DIR, concurrency: int = RECORDING_CONCURRENCY,
+                 chunk_size: int = RECORDING_CHUNK_SIZE):
+        self.directory = directory
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self.stats = {"downloaded": 0, "resumed": 0, "cached": 0, "failed": 0, "bytes": 0}
+        self._client = None
+        self._locks = {}  # call_id -> [lock, fetches using it], so one recording is never written twice at once
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(RECORDING_TIMEOUT, connect=BLAND_CONNECT_TIMEOUT),
+                                             follow_redirects=True)
+        return self._client
+
+    def paths(self, call_id: str):
+        base = os.path.join(self.directory, _SAFE_NAME.sub("_", call_id))
+        return base + ".mp3", base + ".mp3.part", base + ".json"
+
+    def _read_meta(self, path: str) -> dict:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, path: str, meta: dict):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    def cached(self, call_id: str):
+        """Path of a complete recording for the call, or None."""
+        final, _, meta_path = self.paths(call_id)
+        meta = self._read_meta(meta_path)
+        if meta.get("complete") and os.path.exists(final) and os.path.getsize(final) == meta.get("size"):
+            return final
+        return None
+
+    def _headers(self, url: str) -> dict:
+        # Only Bland itself gets the API key; recordings may live on a storage host
+        if urlparse(url).netloc == urlparse(BLAND_API_BASE).netloc:
+            return dict(bland_headers)
+        return {}
+
+    async def _download(self, call_id: str, url: str) -> str:
+        final, part, meta_path = self.paths(call_id)
+        meta = self._read_meta(meta_path)
+        if meta.get("url") != url:
+            meta = {"url": url}
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        request_headers = self._headers(url)
+        if offset and meta.get("etag") and not meta["etag"].startswith("W/"):
+            # If-Range makes the server send the whole file again if it changed
+            request_headers.update({"Range": f"bytes={offset}-", "If-Range": meta["etag"]})
+        elif offset:
+            request_headers["Range"] = f"bytes={offset}-"
+
+        async with self.client.stream("GET", url, headers=request_headers) as response:
+            if response.status_code == 416 and offset:
+                if offset != meta.get("size"):
+                    # The partial file doesn't fit what the server has; start over
+                    os.remove(part)
+                    raise httpx.ReadError(f"cannot resume recording for {call_id}")
+                os.replace(part, final)
+                meta["complete"] = True
+                await asyncio.to_thread(self._write_meta, meta_path, meta)
+                return final
+            response.raise_for_status()
+            if response.status_code == 206:
+                self.stats["resumed"] += 1
+                mode = "ab"
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            else:
+                offset, mode = 0, "wb"
+                total = response.headers.get("Content-Length", "")
+            meta.update({"etag": response.headers.get("ETag"), "size": int(total) if total.isdigit() else None, "complete": False})
+            await asyncio.to_thread(self._write_meta, meta_path, meta)
+
+            f = await asyncio.to_thread(open, part, mode)
+            try:
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    await asyncio.to_thread(f.write, chunk)
+                    self.stats["bytes"] += len(chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+
+        size = os.path.getsize(part)
+        if meta["size"] is not None and size != meta["size"]:
+            raise httpx.ReadError(f"recording for {call_id} ended at {size} of {meta['size']} bytes")
+        os.replace(part, final)
+        meta.update({"size": size, "complete": True})
+        await asyncio.to_thread(self._write_meta, meta_path, meta)
+        return final
+
+    async def fetch(self, call_id: str, url: str = None):
+        """
+        Download one call's recording (looking up its URL on Bland if not
+        given) and return the local path, or None if it can't be fetched.
+        """
+        entry = self._locks.setdefault(call_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await self._fetch(call_id, url)
+        finally:
+            # Dropped only once no fetch holds or waits for it; a waiter about
+            # to wake still counts, so nobody creates a second lock meanwhile
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[call_id]
+
+    async def _fetch(self, call_id: str, url: str = None):
+        path = self.cached(call_id)
+        if path:
+            self.stats["cached"] += 1
+            return path
+        if url is None:
+            url = (await get_call_details(call_id) or {}).get("recording_url")
+            if not url:
+                return None
+        os.makedirs(self.directory, exist_ok=True)
+        for attempt in range(RECORDING_MAX_RETRIES + 1):
+            try:
+                path = await self._download(call_id, url)
+                self.stats["downloaded"] += 1
+                return path
+            except httpx.HTTPStatusError as e:
+                # Client errors (expired or missing URL) won't fix themselves
+                if e.response.status_code < 500 or attempt == RECORDING_MAX_RETRIES:
+                    break
+            except httpx.TransportError:
+                # The .part file is kept, so the next attempt resumes where this one stopped
+                if attempt == RECORDING_MAX_RETRIES:
+                    break
+            await asyncio.sleep(RECORDING_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5))
+        logging.error(f"Failed to download recording for {call_id}")
+        self.stats["failed"] += 1
+        return None
+
+    async def archive(self, items) -> dict:
+        """
+        Fetch many recordings with at most `concurrency` downloads in flight.
+        `items` yields (call_id, url-or-None) and is consumed lazily, so a
+        whole campaign can be archived in bounded memory.
+        """
+        items = iter(items)
+        results = {}
+
+        async def worker():
+            for call_id, url in items:
+                results[call_id] = await self.fetch(call_id, url)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return results
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+fetcher = RecordingFetcher()
+
+registry.gauge("recordings_total", "Recording downloads and bytes fetched", lambda: fetcher.stats, "event", kind="counter")
+
+
+def download_recording(call_id: str, url: str = None):
+    """Blocking helper for scripts: fetch one recording and return its path."""
+    async def run():
+        try:
+            return await fetcher.fetch(call_id, url)
+        finally:
+            await fetcher.aclose()
+    return asyncio.run(run())
@@ -0,0 +1,78 @@
+import os
+import hashlib
+from collections import Counter
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import select
+from dotenv import load_dotenv
+from app.db import engine, reminders
+
+load_dotenv()
+
+# Reminders for a day are spread over this window instead of all firing at 09:00
+REMINDER_WINDOW_START = time.fromisoformat(os.getenv("REMINDER_WINDOW_START", "09:00"))
+REMINDER_WINDOW_END = time.fromisoformat(os.getenv("REMINDER_WINDOW_END", "12:00"))
+REMINDER_MAX_PER_MINUTE = int(os.getenv("REMINDER_MAX_PER_MINUTE", "30"))
+
+
+def _window(day: date):
+    start = datetime.combine(day, REMINDER_WINDOW_START)
+    end = datetime.combine(day, REMINDER_WINDOW_END)
+    return start, max(end, start + timedelta(minutes=1))
+
+
+def _jitter(recipient_key: str, minutes: int):
+    """Stable (minute offset, second) for a recipient, so re-planning gives the same slot."""
+    digest = int(hashlib.sha256(recipient_key.encode("utf-8")).hexdigest(), 16)
+    return digest % minutes, (digest // minutes) % 60
+
+
+def minute_counts(day: date) -> Counter:
+    """Reminders already planned per minute on `day` (keys are minute-truncated datetimes)."""
+    day_start = datetime.combine(day, time.min)
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(reminders.c.run_date)
+            .where(reminders.c.run_date >= day_start, reminders.c.run_date < day_start + timedelta(days=1))
+        ).all()
+    return Counter(row.run_date.replace(second=0, microsecond=0) for row in rows)
+
+
+def plan_send_time(recipient_key: str, day: date, not_before: datetime = None, counts: Counter = None) -> datetime:
+    """
+    Pick the send time for one reminder on `day`: a per-recipient jittered
+    minute inside the send window, moved forward to the next minute that is
+    still under REMINDER_MAX_PER_MINUTE. Overflow spills past the window end.
+    """
+    start, end = _window(day)
+    if not_before is not None and not_before > start:
+        start = not_before.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    minutes = max(1, int((end - start).total_seconds() // 60))
+    offset, second = _jitter(recipient_key, minutes)
+    counts = minute_counts(day) if counts is None else counts
+
+    # Walk the window from the jittered slot, wrapping once, then past the end
+    for step in range(minutes):
+        slot = start + timedelta(minutes=(offset + step) % minutes)
+        if counts[slot] < REMINDER_MAX_PER_MINUTE:
+            break
+    else:
+        slot = start + timedelta(minutes=minutes)
+        while counts[slot] >= REMINDER_MAX_PER_MINUTE:
+            slot += timedelta(minutes=1)
+    counts[slot] += 1
+    return slot.replace(second=second)
+
+
+def plan(day: date) -> dict:
+    """How the reminders planned for `day` are spread across the send window."""
+    counts = minute_counts(day)
+    start, end = _window(day)
+    return {
+        "date": day.isoformat(),
+        "window": [start.strftime("%H:%M"), end.strftime("%H:%M")],
+        "max_per_minute": REMINDER_MAX_PER_MINUTE,
+        "total": sum(counts.values()),
+        "peak_per_minute": max(counts.values(), default=0),
+        "outside_window": sum(n for slot, n in counts.items() if not start <= slot < end),
+        "per_minute": {slot.strftime("%H:%M"): counts[slot] for slot in sorted(counts)},
+    }
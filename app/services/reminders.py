@@ -0,0 +1,132 @@
+import os
+import uuid
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, func
+from sqlalchemy.exc import IntegrityError
+from dotenv import load_dotenv
+from app.db import engine, reminders
+from app.scheduler import scheduler
+from app.services.emailer import build_reminder_message, send_messages
+from app.services.reminder_planner import REMINDER_MAX_PER_MINUTE
+from app.services.telemetry import registry
+
+load_dotenv()
+
+REMINDER_DRAIN_INTERVAL = int(os.getenv("REMINDER_DRAIN_INTERVAL", "30"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "50"))
+REMINDER_MAX_ATTEMPTS = int(os.getenv("REMINDER_MAX_ATTEMPTS", "3"))
+
+# A reminder stuck in "sending" this long belongs to a worker that died mid-send
+STALE_SEND_AFTER = timedelta(minutes=10)
+
+
+def schedule_reminder(call_id: str, run_date: datetime, summary: str, repayment_date: str) -> bool:
+    """
+    Record the reminder for a call; the drain job sends it once it is due.
+    Returns False if the call already has one; safe to call concurrently
+    from several workers.
+    """
+    now = datetime.now()
+    try:
+        with engine.begin() as conn:
+            conn.execute(reminders.insert().values(
+                call_id=call_id, run_date=run_date, summary=summary or "", repayment_date=repayment_date,
+                status="scheduled", attempts=0, created_at=now, updated_at=now,
+            ))
+    except IntegrityError:
+        return False
+    return True
+
+
+def _claim_due(limit: int):
+    """
+    Atomically move up to `limit` due reminders to "sending" under a fresh
+    claim token and return them. Concurrent drains never claim the same row.
+    """
+    token = uuid.uuid4().hex
+    now = datetime.now()
+    with engine.begin() as conn:
+        due = select(reminders.c.call_id).where(reminders.c.status == "scheduled", reminders.c.run_date <= now) \
+            .order_by(reminders.c.run_date).limit(limit)
+        ids = [row.call_id for row in conn.execute(due)]
+        if not ids:
+            return []
+        conn.execute(
+            update(reminders)
+            .where(reminders.c.call_id.in_(ids), reminders.c.status == "scheduled")
+            .values(status="sending", claimed_by=token, updated_at=now)
+        )
+        return conn.execute(select(reminders).where(reminders.c.claimed_by == token, reminders.c.status == "sending")).all()
+
+
+def _finish(rows, results):
+    now = datetime.now()
+    with engine.begin() as conn:
+        for row, sent in zip(rows, results):
+            if sent:
+                values = {"status": "sent"}
+            elif row.attempts + 1 >= REMINDER_MAX_ATTEMPTS:
+                values = {"status": "failed", "attempts": row.attempts + 1}
+            else:
+                values = {"status": "scheduled", "attempts": row.attempts + 1}
+            conn.execute(update(reminders).where(reminders.c.call_id == row.call_id).values(updated_at=now, **values))
+
+
+def _sent_last_minute() -> int:
+    since = datetime.now() - timedelta(minutes=1)
+    with engine.connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(reminders)
+            .where(reminders.c.status.in_(("sending", "sent")), reminders.c.updated_at >= since)
+        ).scalar_one()
+
+
+def due_backlog() -> int:
+    """Reminders that are due but not sent yet (the email queue depth)."""
+    with engine.connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(reminders)
+            .where(reminders.c.status.in_(("scheduled", "sending")), reminders.c.run_date <= datetime.now())
+        ).scalar_one()
+
+
+def drain_due_reminders():
+    """
+    Scheduler job: send every due reminder in batches over the pooled SMTP
+    sessions, never more than REMINDER_MAX_PER_MINUTE across all workers.
+    Rows that fail are retried on later drains up to REMINDER_MAX_ATTEMPTS.
+    """
+    while True:
+        budget = min(REMINDER_BATCH_SIZE, REMINDER_MAX_PER_MINUTE - _sent_last_minute())
+        if budget <= 0:
+            return
+        rows = _claim_due(budget)
+        if not rows:
+            return
+        results = send_messages([build_reminder_message(row.summary, row.repayment_date) for row in rows])
+        _finish(rows, results)
+        print(f"✅ Sent {sum(results)}/{len(rows)} reminder emails")
+        if len(rows) < budget:
+            return
+
+
+def catch_up():
+    """
+    Run at startup: release reminders a crashed worker left half-sent and
+    register the drain job, which sends anything missed while we were down.
+    """
+    now = datetime.now()
+    with engine.begin() as conn:
+        released = conn.execute(
+            update(reminders)
+            .where(reminders.c.status == "sending", reminders.c.updated_at < now - STALE_SEND_AFTER)
+            .values(status="scheduled", updated_at=now)
+        ).rowcount
+    if released:
+        logging.info(f"Released {released} reminders left in sending")
+    scheduler.add_job(drain_due_reminders, 'interval', seconds=REMINDER_DRAIN_INTERVAL, id="drain-reminders",
+                      replace_existing=True, next_run_time=now)
+
+
+registry.gauge("reminders_due", "Reminder emails that are due but not sent yet", due_backlog)
@@ -0,0 +1,235 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from dotenv import load_dotenv
+from app.services.telemetry import registry
+
+load_dotenv()
+
+
+class CircuitOpenError(Exception):
+    """A provider's circuit is open; `retry_after` is when the next trial request is allowed."""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"{provider} circuit is open, retry in {retry_after:.1f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects requests
+    for `reset_timeout` seconds. After that one trial request at a time is let
+    through (half-open); its success closes the circuit, its failure reopens it.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.opens = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def retry_after(self) -> float:
+        """Seconds until a request may be tried; 0 unless the circuit is open."""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record(self, ok: bool):
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+            return
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            # A failed trial restarts the cooldown
+            if self.opened_at is None:
+                self.opens += 1
+            self.opened_at = time.monotonic()
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: grows by one for every `limit` requests that
+    finish fast and cleanly, and is multiplied by `backoff` when one fails or
+    is slower than `latency_target`, at most once per `latency_target` so a
+    burst of failures from the same moment only counts once.
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int, latency_target: float, backoff: float = 0.5):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.in_flight = 0
+        self._waiters = deque()
+        self._last_decrease = 0.0
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                # Pass our wake-up on if a slot was handed to us as we were cancelled
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()
+                raise
+        self.in_flight += 1
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def release(self, latency: float, ok: bool = None):
+        """Give back a slot; `ok` None (e.g. cancelled) leaves the limit as it is."""
+        self.in_flight -= 1
+        now = time.monotonic()
+        if ok and latency <= self.latency_target:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        elif ok is not None and now - self._last_decrease >= self.latency_target:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+            self._last_decrease = now
+        self._wake()
+
+
+class Provider:
+    """
+    Resilience layer in front of one upstream: every request gets a hard
+    timeout, waits for a slot under the adaptive concurrency limit, and is
+    rejected straight away with CircuitOpenError while the circuit is open.
+    """
+
+    def __init__(self, name: str, timeout: float, max_concurrency: int, min_concurrency: int = 1,
+                 latency_target: float = 5.0, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.limiter = AdaptiveLimiter(max_concurrency, min_concurrency, max_concurrency, latency_target)
+        self.stats = {"requests": 0, "failures": 0, "timeouts": 0, "rejected": 0}
+
+    @classmethod
+    def from_env(cls, name: str, timeout: float, max_concurrency: int, latency_target: float):
+        """Settings come from <NAME>_REQUEST_TIMEOUT, _CONCURRENCY_MIN/_MAX, _LATENCY_TARGET, _CIRCUIT_FAILURES and _CIRCUIT_RESET."""
+        prefix = name.upper()
+        return cls(
+            name,
+            timeout=float(os.getenv(f"{prefix}_REQUEST_TIMEOUT", str(timeout))),
+            max_concurrency=int(os.getenv(f"{prefix}_CONCURRENCY_MAX", str(max_concurrency))),
+            min_concurrency=int(os.getenv(f"{prefix}_CONCURRENCY_MIN", "1")),
+            latency_target=float(os.getenv(f"{prefix}_LATENCY_TARGET", str(latency_target))),
+            failure_threshold=int(os.getenv(f"{prefix}_CIRCUIT_FAILURES", "5")),
+            reset_timeout=float(os.getenv(f"{prefix}_CIRCUIT_RESET", "30")),
+        )
+
+    def _check(self):
+        if not self.breaker.allow():
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(self.name, self.breaker.retry_after())
+
+    async def call(self, fn, *args, is_failure=None, **kwargs):
+        """
+        Await fn(*args, **kwargs) under the timeout, limit and breaker.
+        Exceptions count as failures, and so do results for which
+        `is_failure(result)` is true (e.g. 5xx responses); both are returned
+        or raised unchanged.
+        """
+        self._check()
+        trial = self.breaker.state == CircuitBreaker.HALF_OPEN
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            if trial:
+                self.breaker.trial_in_flight = False
+            raise
+        start = time.monotonic()
+        ok = None  # stays None if we are cancelled, which says nothing about the provider
+        try:
+            result = await asyncio.wait_for(fn(*args, **kwargs), self.timeout)
+            ok = not (is_failure and is_failure(result))
+            return result
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            ok = False
+            raise
+        except Exception:
+            ok = False
+            raise
+        finally:
+            self.limiter.release(time.monotonic() - start, ok)
+            if trial:
+                self.breaker.trial_in_flight = False
+            if ok is not None:
+                self._record(ok, trial)
+
+    def _record(self, ok: bool, trial: bool):
+        self.stats["requests"] += 1
+        if not ok:
+            self.stats["failures"] += 1
+        was_open = self.breaker.opened_at is not None
+        self.breaker.record(ok)
+        if self.breaker.opened_at is not None and not was_open:
+            logging.warning(f"{self.name} circuit opened after {self.breaker.failures} consecutive failures")
+        elif trial and ok:
+            logging.info(f"{self.name} circuit closed")
+
+    async def wait_ready(self):
+        """Sleep out an open circuit, for background work that should wait rather than fail."""
+        delay = self.breaker.retry_after()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def metrics(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "concurrency_limit": int(self.limiter.limit),
+            "in_flight": self.limiter.in_flight,
+            "circuit_opens": self.breaker.opens,
+            **self.stats,
+        }
+
+
+bland_provider = Provider.from_env("bland", timeout=30, max_concurrency=int(os.getenv("BLAND_POOL_SIZE", "20")), latency_target=5)
+gemini_provider = Provider.from_env("gemini", timeout=120, max_concurrency=int(os.getenv("GEMINI_WORKERS", "4")), latency_target=30)
+providers = {provider.name: provider for provider in (bland_provider, gemini_provider)}
+
+_STATES = {CircuitBreaker.CLOSED: 0, CircuitBreaker.HALF_OPEN: 1, CircuitBreaker.OPEN: 2}
+registry.gauge("circuit_state", "Circuit breaker state per provider (0 closed, 1 half-open, 2 open)",
+               lambda: {name: _STATES[p.breaker.state] for name, p in providers.items()}, "provider")
+registry.gauge("concurrency_limit", "Adaptive concurrency limit per provider",
+               lambda: {name: int(p.limiter.limit) for name, p in providers.items()}, "provider")
+registry.gauge("provider_in_flight", "Requests in flight per provider",
+               lambda: {name: p.limiter.in_flight for name, p in providers.items()}, "provider")
+registry.gauge("circuit_opens_total", "Times each provider's circuit opened",
+               lambda: {name: p.breaker.opens for name, p in providers.items()}, "provider", kind="counter")
+registry.gauge("circuit_rejected_total", "Requests rejected by an open circuit",
+               lambda: {name: p.stats["rejected"] for name, p in providers.items()}, "provider", kind="counter")
@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import logging
+import threading
+from dotenv import load_dotenv
+from app.services.telemetry import registry, upstream_requests
+
+load_dotenv()
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+SUPABASE_TABLE = os.getenv("SUPABASE_TABLE", "calls")
+SUPABASE_BATCH_SIZE = int(os.getenv("SUPABASE_BATCH_SIZE", "100"))
+SUPABASE_FLUSH_INTERVAL = float(os.getenv("SUPABASE_FLUSH_INTERVAL", "5"))
+SUPABASE_MAX_RETRIES = int(os.getenv("SUPABASE_MAX_RETRIES", "3"))
+SUPABASE_BACKOFF = float(os.getenv("SUPABASE_BACKOFF", "1"))
+# Records that could not be written are appended here and replayed on the next flush
+SUPABASE_SPILL_PATH = os.getenv("SUPABASE_SPILL_PATH", "supabase_spill.jsonl")
+# After a failed flush, new records go straight to the spill file for this long
+SUPABASE_RETRY_AFTER = float(os.getenv("SUPABASE_RETRY_AFTER", "60"))
+
+
+class SupabaseSink:
+    """
+    Buffers completed call records and writes them to Supabase in bulk
+    upserts (on call_id) when the buffer reaches `batch_size` or every
+    `flush_interval` seconds. Failed batches are retried with backoff and
+    then spilled to a local JSONL file until Supabase is reachable again.
+    """
+
+    def __init__(self, client=None, table: str = SUPABASE_TABLE, batch_size: int = SUPABASE_BATCH_SIZE,
+                 flush_interval: float = SUPABASE_FLUSH_INTERVAL, spill_path: str = SUPABASE_SPILL_PATH):
+        self._client = client
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.buffer = []
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+        self.stopping = False
+        self.retry_at = 0.0
+
+    @property
+    def client(self):
+        if self._client is None:
+            from supabase import create_client
+            self._client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return self._client
+
+    def start(self):
+        if self.thread is None:
+            self.stopping = False
+            self.thread = threading.Thread(target=self._run, name="supabase-sink", daemon=True)
+            self.thread.start()
+
+    def add(self, record: dict):
+        with self.condition:
+            self.buffer.append(record)
+            if len(self.buffer) >= self.batch_size:
+                self.condition.notify()
+
+    def close(self) -> int:
+        """Stop the flush thread and flush what is left; returns the number of records spilled."""
+        if self.thread is not None:
+            with self.condition:
+                self.stopping = True
+                self.condition.notify()
+            self.thread.join()
+            self.thread = None
+        return self.flush()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self.stopping and len(self.buffer) < self.batch_size:
+                    self.condition.wait(self.flush_interval)
+                if self.stopping:
+                    return
+            self.flush()
+
+    def _upsert(self, rows: list[dict]) -> bool:
+        for attempt in range(SUPABASE_MAX_RETRIES + 1):
+            try:
+                self.client.table(self.table).upsert(rows, on_conflict="call_id").execute()
+                upstream_requests.inc("supabase", "ok")
+                return True
+            except Exception as e:
+                upstream_requests.inc("supabase", "error")
+                if attempt == SUPABASE_MAX_RETRIES:
+                    logging.error(f"Supabase upsert of {len(rows)} rows failed: {e}")
+                    return False
+                time.sleep(SUPABASE_BACKOFF * (2 ** attempt))
+
+    def _spill(self, rows: list[dict]):
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+        print(f"⚠️ Spilled {len(rows)} call records to {self.spill_path}")
+
+    def _take_spill(self) -> list[dict]:
+        if not os.path.exists(self.spill_path):
+            return []
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        os.remove(self.spill_path)
+        return rows
+
+    def flush(self) -> int:
+        """Write out the buffer and any earlier spill; returns how many records were spilled instead."""
+        with self.flush_lock:
+            with self.condition:
+                rows, self.buffer = self.buffer, []
+            if time.monotonic() < self.retry_at:
+                if rows:
+                    self._spill(rows)
+                return len(rows)
+            rows = self._take_spill() + rows
+            # Later records for the same call win, and one upsert can't touch a row twice
+            rows = list({row["call_id"]: row for row in rows}.values())
+            for start in range(0, len(rows), self.batch_size):
+                chunk = rows[start:start + self.batch_size]
+                if not self._upsert(chunk):
+                    self._spill(rows[start:])
+                    self.retry_at = time.monotonic() + SUPABASE_RETRY_AFTER
+                    return len(rows) - start
+            return 0
+
+
+sink = SupabaseSink() if SUPABASE_URL and SUPABASE_KEY else None
+
+if sink is not None:
+    registry.gauge("supabase_buffered_records", "Call records waiting for the next Supabase upsert", lambda: len(sink.buffer))
@@ -1,5 +1,5 @@
-import re
-import json
+import time
+import asyncio
 
 def normalize_phone(phone: str):
     phone = str(phone).strip()
@@ -7,11 +7,88 @@ def normalize_phone(phone: str):
         phone = "+" + phone
     return phone
 
-def extract_json_from_response(text: str):
-    match = re.search(r"\{.*\}", text, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group())
-        except:
-            return {}
-    return {}
+# Country calling code and national number length for the regions we dial
+PHONE_REGIONS = {
+    "IN": ("91", 10),
+    "US": ("1", 10),
+    "CA": ("1", 10),
+    "GB": ("44", 10),
+    "AE": ("971", 9),
+    "AU": ("61", 9),
+    "SG": ("65", 8),
+}
+
+def normalize_phones(values, default_region: str = "IN"):
+    """
+    Vectorized E.164 normalization for a whole column of phone numbers.
+    Handles spreadsheet floats (919876543210.0, 9.19876543210e+11), spaces,
+    dashes, brackets, 00 prefixes and national numbers with leading zeros.
+
+    Returns (e164, valid, duplicate) as pandas Series aligned with the input:
+    e164 is "" where invalid, and duplicate marks every valid repeat of a
+    number seen earlier in the batch, so each number is dialed once.
+    """
+    import pandas as pd
+
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series):
+        text = series.round().astype("Int64").astype(str).where(series.notna(), "")
+    else:
+        text = series.astype(object).where(series.notna(), "").astype(str).str.strip()
+
+    # Scientific notation only survives if the mantissa kept every digit
+    sci = text.str.fullmatch(r"\d+(\.\d+)?[eE]\+?\d+")
+    lossy = sci & (text.str.extract(r"^([\d.]+)[eE]", expand=False).str.replace(".", "", regex=False).str.len() < 10)
+    if sci.any():
+        text[sci] = pd.to_numeric(text[sci], errors="coerce").round().astype("Int64").astype(str)
+    text = text.str.replace(r"\.0+$", "", regex=True)
+
+    has_plus = text.str.startswith("+")
+    digits = text.str.replace(r"\D", "", regex=True)
+    intl_prefix = ~has_plus & digits.str.startswith("00")
+    digits = digits.where(~intl_prefix, digits.str[2:])
+
+    code, length = PHONE_REGIONS.get(default_region.upper(), PHONE_REGIONS["IN"])
+    national = digits.str.lstrip("0")
+    # National numbers (optionally with trunk zeros) get the default country code;
+    # anything else without a + is assumed to already carry its country code
+    local = ~has_plus & ~intl_prefix & (national.str.len() == length)
+    digits = digits.where(~local, code + national)
+    digits = digits.where(has_plus | intl_prefix | local, national)
+
+    e164 = "+" + digits
+    valid = e164.str.fullmatch(r"\+[1-9]\d{7,14}") & ~lossy
+    for cc, n in set(PHONE_REGIONS.values()):
+        known = e164.str.startswith("+" + cc)
+        valid &= ~known | (e164.str.len() == len(cc) + n + 1)
+
+    e164 = e164.where(valid, "")
+    duplicate = valid & e164.duplicated(keep="first")
+    return e164, valid, duplicate
+
+class TokenBucket:
+    """
+    Async token bucket: refills `rate` tokens per second up to `capacity`.
+    acquire() waits until a token is available instead of sleeping a fixed time.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
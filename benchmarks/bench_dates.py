@@ -0,0 +1,121 @@
+"""
+Benchmark and accuracy check for the repayment-date resolver.
+
+    python -m benchmarks.bench_dates [repeat]
+
+Every utterance in CORPUS is resolved against a fixed call time (Monday
+2025-06-02) and compared with its expected date (None = no commitment).
+"cold" clears the per-phrase cache before each utterance, "warm" reuses it
+as a campaign of similar calls would, and "dateutil" is the old
+dateutil.parser.parse(fuzzy=True) path on the same text.
+"""
+import sys
+import time
+from datetime import datetime, date
+from app.services import dates
+
+NOW = datetime(2025, 6, 2, 10, 30)
+
+CORPUS = [
+    ("I will pay tomorrow.", date(2025, 6, 3)),
+    ("I can pay the day after tomorrow", date(2025, 6, 4)),
+    ("Main kal payment kar dunga", date(2025, 6, 3)),
+    ("parso tak kar dunga", date(2025, 6, 4)),
+    ("I'll clear it today itself", date(2025, 6, 2)),
+    ("Give me two days", None),
+    ("I will pay in two days", date(2025, 6, 4)),
+    ("I can pay within 10 days", date(2025, 6, 12)),
+    ("after 3 days I will transfer", date(2025, 6, 5)),
+    ("in a couple of days", date(2025, 6, 4)),
+    ("I'll pay in a week", date(2025, 6, 9)),
+    ("I'll pay next week", date(2025, 6, 9)),
+    ("I will pay on Friday", date(2025, 6, 6)),
+    ("this Friday for sure", date(2025, 6, 6)),
+    ("next Friday", date(2025, 6, 13)),
+    ("coming Wednesday", date(2025, 6, 4)),
+    ("by the weekend", date(2025, 6, 7)),
+    ("I'll do it this weekend", date(2025, 6, 7)),
+    ("on 2025-06-15", date(2025, 6, 15)),
+    ("I will pay on 15/06/2025", date(2025, 6, 15)),
+    ("pay by 10/6", date(2025, 6, 10)),
+    ("I'll pay on 20.06.25", date(2025, 6, 20)),
+    ("on 15-06-2025", date(2025, 6, 15)),
+    ("pay by 10.6", date(2025, 6, 10)),
+    ("give me 1-2 days", None),
+    ("please give me 2-3 days", None),
+    ("I need 2-3 weeks to arrange it", None),
+    ("I can pay 1.5 lakh now", None),
+    ("ok 10/6 days", None),
+    ("on 5th June", date(2025, 6, 5)),
+    ("on the 5th of June", date(2025, 6, 5)),
+    ("June 20th", date(2025, 6, 20)),
+    ("July 1, 2025", date(2025, 7, 1)),
+    ("10th July 2025", date(2025, 7, 10)),
+    ("15 Aug", date(2025, 8, 15)),
+    ("by the 10th", date(2025, 6, 10)),
+    ("before the 1st", date(2025, 7, 1)),
+    ("salary aayegi 7 tarikh ko", date(2025, 6, 7)),
+    ("on 5th of next month", date(2025, 7, 5)),
+    ("end of the month", date(2025, 6, 30)),
+    ("month-end tak", date(2025, 6, 30)),
+    ("I will pay next month", date(2025, 7, 1)),
+    ("I cannot pay tomorrow, but I will pay on Friday", date(2025, 6, 6)),
+    ("not today, maybe next week", date(2025, 6, 9)),
+    ("I already paid yesterday", None),
+    ("I lost my job and I don't know when I can pay", None),
+    ("Please call me later", None),
+    ("I paid on 1st May", None),
+    ("I have two loans with you", None),
+    ("My EMI is 5000 rupees", None),
+    ("within the next 5 days", date(2025, 6, 7)),
+    ("after one month", date(2025, 7, 2)),
+]
+
+
+def run_resolver(corpus, cold: bool):
+    results = []
+    for text, _ in corpus:
+        if cold:
+            dates.resolve_phrase.cache_clear()
+        resolution = dates.resolve(text, NOW)
+        results.append(resolution.date if resolution else None)
+    return results
+
+
+def run_dateutil(corpus):
+    from dateutil import parser
+    results = []
+    for text, _ in corpus:
+        try:
+            parsed = parser.parse(text, fuzzy=True, default=NOW).date()
+        except (ValueError, OverflowError):
+            parsed = None
+        results.append(parsed)
+    return results
+
+
+def bench(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = fn()
+        best = min(best, time.perf_counter() - start)
+    return best / len(CORPUS) * 1e6, results
+
+
+def accuracy(results):
+    return sum(got == want for got, (_, want) in zip(results, CORPUS)) / len(CORPUS)
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    cold, cold_results = bench(lambda: run_resolver(CORPUS, cold=True), repeat)
+    warm, warm_results = bench(lambda: run_resolver(CORPUS, cold=False), repeat)
+    old, old_results = bench(lambda: run_dateutil(CORPUS), repeat)
+    print(f"{len(CORPUS)} utterances, call time {NOW:%a %Y-%m-%d}")
+    print(f"resolver cold: {cold:8.2f} us/utterance  accuracy {accuracy(cold_results):.0%}")
+    print(f"resolver warm: {warm:8.2f} us/utterance  accuracy {accuracy(warm_results):.0%}")
+    print(f"dateutil:      {old:8.2f} us/utterance  accuracy {accuracy(old_results):.0%}")
+    misses = [(text, want, got) for got, (text, want) in zip(warm_results, CORPUS) if got != want]
+    for text, want, got in misses:
+        print(f"  miss: {text!r}: expected {want}, got {got}")
@@ -0,0 +1,60 @@
+"""
+Import-time report for the app, to catch startup regressions.
+
+    python -m benchmarks.bench_importtime [module] [budget_ms]
+
+Runs `python -X importtime -c "import <module>"` (default app.main) in a fresh
+interpreter and prints the total, the slowest top-level packages, and any
+of LAZY_MODULES that were imported anyway; those should only load on first
+use. Exits non-zero if a lazy module leaks in or the total is over budget_ms.
+"""
+import os
+import sys
+import subprocess
+from collections import defaultdict
+
+# Heavy libraries the services load on first use, never at import
+LAZY_MODULES = ["pandas", "inflect", "google.generativeai", "torch", "transformers", "openpyxl"]
+
+
+def import_times(module: str):
+    """(module, self_us, cumulative_us) for every import made by `import module`."""
+    env = dict(os.environ, GEMINI_MODEL=os.environ.get("GEMINI_MODEL", "gemini-2.0-flash"))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr[-2000:]}")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def report(module: str, budget_ms: float = None, top: int = 10) -> bool:
+    rows = import_times(module)
+    total_ms = next(cumulative for name, _, cumulative in rows if name == module) / 1000
+    by_package = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"import {module}: {total_ms:.0f} ms, {len(rows)} modules")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<24} {self_us / 1000:8.1f} ms")
+
+    imported = {name for name, _, _ in rows}
+    leaked = [name for name in LAZY_MODULES if name in imported]
+    for name in leaked:
+        print(f"  leaked: {name} is imported at startup")
+    over = budget_ms is not None and total_ms > budget_ms
+    if over:
+        print(f"  over budget: {total_ms:.0f} ms > {budget_ms:.0f} ms")
+    return not leaked and not over
+
+
+if __name__ == "__main__":
+    module = sys.argv[1] if len(sys.argv) > 1 else "app.main"
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    sys.exit(0 if report(module, budget) else 1)
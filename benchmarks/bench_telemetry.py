@@ -0,0 +1,56 @@
+"""
+Overhead of the pipeline instrumentation.
+
+    python -m benchmarks.bench_telemetry [n]
+
+"stage" is one `with telemetry.stage(...)` block around a no-op, i.e. what
+each dial, status fetch, analysis, date parse, schedule or email pays;
+"counter" is one upstream_requests.inc(). "threads" repeats the stage
+timing from 8 threads at once to show lock contention, and "render" is a
+full /metrics scrape body with every stage populated.
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.services import telemetry
+
+STAGES = ["dial", "status_fetch", "preanalysis", "analysis", "gemini", "date_parse", "schedule", "email"]
+
+
+def per_op(fn, n: int) -> float:
+    start = time.perf_counter()
+    fn(n)
+    return (time.perf_counter() - start) / n * 1e9
+
+
+def baseline(n: int):
+    for i in range(n):
+        pass
+
+
+def stages(n: int):
+    for i in range(n):
+        with telemetry.stage(STAGES[i & 7]):
+            pass
+
+
+def counters(n: int):
+    for i in range(n):
+        telemetry.upstream_requests.inc("bland", "2xx")
+
+
+def threaded(n: int, threads: int = 8):
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(stages, [n // threads] * threads))
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    loop = per_op(baseline, n)
+    print(f"stage:   {per_op(stages, n) - loop:8.0f} ns/op")
+    print(f"counter: {per_op(counters, n) - loop:8.0f} ns/op")
+    print(f"threads: {per_op(threaded, n) - loop:8.0f} ns/op (8 threads, wall time per op)")
+    start = time.perf_counter()
+    for _ in range(100):
+        body = telemetry.registry.render()
+    print(f"render:  {(time.perf_counter() - start) * 10:8.2f} ms/scrape ({len(body.splitlines())} lines)")
@@ -0,0 +1,232 @@
+"""
+Local stand-ins for the services the app talks to, so it can be load-tested
+without placing real calls: a Bland API server, a Supabase (PostgREST)
+upsert endpoint and an SMTP sink. Every fake takes a latency (seconds,
+jittered ±50%), and most an error rate. The fake Gemini model lives in the
+app, as app.services.fake_gemini, since GEMINI_MODEL=fake runs it.
+"""
+import time
+import uuid
+import random
+import asyncio
+import threading
+import socketserver
+from collections import Counter, deque
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+# What customers say, by share of calls: promises, voicemails (skipped by
+# pre-analysis), wrong numbers and hardship conversations
+TRANSCRIPTS = [
+    (0.5, "assistant: Hello, this is a reminder about your overdue loan with {bank}.\n"
+          "user: Yes, I know about it. My salary comes on Thursday, so I will pay on Friday for sure.\n"
+          "assistant: Thank you, we will note Friday as your payment date."),
+    (0.2, "user: Hi, you have reached my voicemail. Please leave a message after the beep."),
+    (0.1, "assistant: Hello, am I speaking with the account holder?\n"
+          "user: Sorry, wrong number, there is no one by that name here."),
+    (0.2, "assistant: Hello, this is a reminder about your overdue loan with {bank}.\n"
+          "user: I lost my job last month and I cannot pay right now. Maybe next month I can pay half of it.\n"
+          "assistant: I understand. Could you pay a part of it by the 10th?\n"
+          "user: I will try, but I cannot promise anything."),
+]
+
+
+def _jitter(latency: float) -> float:
+    return latency * random.uniform(0.5, 1.5) if latency else 0.0
+
+
+class FakeBland:
+    """
+    Bland's /v1/calls endpoints. A placed call is "queued" for `ring_time`,
+    "in-progress" for `call_duration`, then "completed" with a transcript, or
+    "no-answer" for `no_answer_rate` of calls. Errors are 429s (which the
+    client retries) and 503s in equal parts. script() queues exact outcomes
+    for the next requests, for tests.
+    """
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.0, ring_time: float = 1.0,
+                 call_duration: float = 3.0, no_answer_rate: float = 0.1):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.ring_time = ring_time
+        self.call_duration = call_duration
+        self.no_answer_rate = no_answer_rate
+        self.calls = {}  # call_id -> (placed_at, answered, transcript)
+        self.stats = Counter()
+        self.steps = deque()
+        self.hang_time = 2.0
+        self.app = Starlette(routes=[
+            Route("/v1/calls", self.create_call, methods=["POST"]),
+            Route("/v1/calls/{call_id}", self.get_call, methods=["GET"]),
+        ])
+
+    def script(self, *steps):
+        """
+        Outcomes for the next requests, in order: a status code to fail with,
+        (status, retry_after) to also send Retry-After, or "hang" to stall for
+        `hang_time` before answering normally. Later requests behave as usual.
+        """
+        self.steps.extend(steps)
+
+    async def _respond(self, kind: str):
+        step = self.steps.popleft() if self.steps else None
+        self.stats[kind] += 1
+        if step == "hang":
+            await asyncio.sleep(self.hang_time)
+        await asyncio.sleep(_jitter(self.latency))
+        if step is not None and step != "hang":
+            status, retry_after = step if isinstance(step, tuple) else (step, None)
+            self.stats[f"{kind}_errors"] += 1
+            return JSONResponse({"message": "scripted failure"}, status_code=status,
+                                headers={"Retry-After": str(retry_after)} if retry_after is not None else None)
+        if self.error_rate and random.random() < self.error_rate:
+            self.stats[f"{kind}_errors"] += 1
+            return JSONResponse({"message": "fake overload"}, status_code=random.choice((429, 503)))
+        return None
+
+    async def create_call(self, request):
+        payload = await request.json()
+        error = await self._respond("create")
+        if error is not None:
+            return error
+        weights, texts = zip(*TRANSCRIPTS)
+        transcript = random.choices(texts, weights)[0].format(bank="the bank")
+        call_id = uuid.uuid4().hex
+        self.calls[call_id] = (time.monotonic(), random.random() >= self.no_answer_rate, transcript)
+        return JSONResponse({"status": "success", "call_id": call_id, "phone_number": payload.get("phone_number")})
+
+    async def get_call(self, request):
+        error = await self._respond("status")
+        if error is not None:
+            return error
+        call_id = request.path_params["call_id"]
+        call = self.calls.get(call_id)
+        if call is None:
+            return JSONResponse({"message": "call not found"}, status_code=404)
+        placed_at, answered, transcript = call
+        age = time.monotonic() - placed_at
+        if age < self.ring_time:
+            return JSONResponse({"call_id": call_id, "status": "queued"})
+        if not answered:
+            return JSONResponse({"call_id": call_id, "status": "no-answer", "completed": True})
+        if age < self.ring_time + self.call_duration:
+            return JSONResponse({"call_id": call_id, "status": "in-progress"})
+        return JSONResponse({"call_id": call_id, "status": "completed", "completed": True,
+                             "concatenated_transcript": transcript})
+
+
+class FakeSupabase:
+    """
+    PostgREST's bulk upsert, POST /rest/v1/<table>?on_conflict=<column>, as
+    the Supabase client sends it; rows are kept in `tables`. While `down` is
+    set every request fails with a 503, and script() queues status codes for
+    the next requests to fail with.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.down = False
+        self.tables = {}  # table -> {conflict key: row}
+        self.requests = []  # (table, number of rows, status) per request
+        self.steps = deque()
+        self.app = Starlette(routes=[Route("/rest/v1/{table}", self.upsert, methods=["POST"])])
+
+    def script(self, *statuses):
+        self.steps.extend(statuses)
+
+    async def upsert(self, request):
+        table = request.path_params["table"]
+        rows = await request.json()
+        rows = rows if isinstance(rows, list) else [rows]
+        await asyncio.sleep(_jitter(self.latency))
+        status = self.steps.popleft() if self.steps else (503 if self.down else 201)
+        self.requests.append((table, len(rows), status))
+        if status >= 400:
+            return JSONResponse({"message": "fake failure", "code": str(status)}, status_code=status)
+        key = request.query_params.get("on_conflict")
+        stored = self.tables.setdefault(table, {})
+        for row in rows:
+            stored[row[key] if key else uuid.uuid4().hex] = row
+        return JSONResponse(rows, status_code=201)
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        sink = self.server.sink
+        self.reply("220 fake ESMTP ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].decode(errors="replace").upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250 fake")
+            elif command == "DATA":
+                self.reply("354 end data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                time.sleep(_jitter(sink.latency))
+                if sink.error_rate and random.random() < sink.error_rate:
+                    sink.stats["errors"] += 1
+                    self.reply("451 fake transient failure")
+                else:
+                    sink.stats["messages"] += 1
+                    self.reply("250 OK queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self.reply("250 OK")
+
+
+class SMTPSink:
+    """Plain-SMTP server that accepts and counts messages; errors are 451s, which the emailer retries."""
+
+    def __init__(self, latency: float = 0.02, error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.stats = Counter()
+        self.server = None
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), _SMTPHandler)
+        self.server.daemon_threads = True
+        self.server.sink = self
+        threading.Thread(target=self.server.serve_forever, name="smtp-sink", daemon=True).start()
+        return self.server.server_address[1]
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+class ServerThread:
+    """Runs an ASGI app under uvicorn on its own thread and event loop."""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        self.config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(self.config)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_until_complete, args=(self.server.serve(),), daemon=True)
+
+    def start(self, timeout: float = 60) -> str:
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("server did not start")
+            time.sleep(0.01)
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
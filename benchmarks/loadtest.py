@@ -0,0 +1,370 @@
+"""
+Offline load test: the whole app against local fakes for Bland, Gemini and SMTP.
+
+    python -m benchmarks.loadtest [--calls 500] [--upload-rows 2000] [--json out.json] ...
+
+The app runs under uvicorn in this process against a throwaway SQLite
+database and the fake Gemini model. The fake Bland server
+(benchmarks.fakes.FakeBland) and SMTP sink run in one child process and
+the HTTP clients in another, so their work doesn't count against the app.
+Each upstream has a configurable latency and error rate. Phases:
+
+  start-call   --calls POST /start-call/ with --concurrency clients
+  call-status  --status-requests GET /call-status/{id} over those calls
+  upload       one POST /upload-contacts/ of --upload-rows rows, timed until
+               the batch has dialed every row
+  analysis     until every call has ended and been analyzed via the reconciler
+  email        every scheduled reminder made due and drained through SMTP
+
+It prints throughput and p50/p99 latency per phase, per-stage timings from
+the app's own metrics, and how long the app's event loop was blocked: a
+probe task sleeps EVENT_LOOP_PROBE seconds at a time, and any overshoot past
+--stall-ms counts as blocking. Compare the --json output across commits to
+catch regressions before deploy.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from datetime import datetime
+
+EVENT_LOOP_PROBE = 0.005
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1], formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=500, help="single calls placed through /start-call/")
+    parser.add_argument("--status-requests", type=int, default=2000, help="GET /call-status/ requests")
+    parser.add_argument("--upload-rows", type=int, default=2000, help="rows in the uploaded contact sheet (0 to skip)")
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent HTTP clients")
+    parser.add_argument("--bland-latency", type=float, default=0.05)
+    parser.add_argument("--bland-error-rate", type=float, default=0.0)
+    parser.add_argument("--call-duration", type=float, default=3.0, help="seconds a fake call stays in progress")
+    parser.add_argument("--gemini-latency", type=float, default=0.5)
+    parser.add_argument("--gemini-error-rate", type=float, default=0.0)
+    parser.add_argument("--smtp-latency", type=float, default=0.02)
+    parser.add_argument("--smtp-error-rate", type=float, default=0.0)
+    parser.add_argument("--dial-rate", type=float, default=200, help="bulk dialer calls per second (BLAND_CALLS_PER_SECOND)")
+    parser.add_argument("--timeout", type=float, default=300, help="give up waiting for a phase after this many seconds")
+    parser.add_argument("--stall-ms", type=float, default=20, help="event-loop delays above this count as blocking")
+    parser.add_argument("--json", help="also write the results to this file")
+    return parser.parse_args(argv)
+
+
+def configure_env(args, workdir: str, bland_url: str, smtp_port: int):
+    # Must run before anything under app/ is imported: services read their
+    # settings at import. load_dotenv() never overrides these, so a local
+    # .env with real keys is not used.
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'loadtest.db')}",
+        "BLAND_API_BASE": bland_url,
+        "BLAND_API_KEY": "loadtest",
+        "BLAND_WEBHOOK_URL": "",
+        "BLAND_CALLS_PER_SECOND": str(args.dial_rate),
+        "BLAND_BURST": str(max(1, int(args.dial_rate))),
+        "BLAND_MAX_CONCURRENCY": str(args.concurrency),
+        "BLAND_BACKOFF": "0.05",
+        # Dial at any hour; the fake numbers live in no particular time zone
+        "CALLING_WINDOW": "00:00-24:00",
+        "GEMINI_MODEL": "fake",
+        "GEMINI_REQUESTS_PER_MINUTE": "100000",
+        "SMTP_SERVER": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_STARTTLS": "false",
+        "SMTP_USER": "reminders@loadtest.invalid",
+        "SMTP_PASSWORD": "",
+        "SMTP_BACKOFF": "0.05",
+        "EMAIL_RECIPIENT": "customer@loadtest.invalid",
+        # The email phase drains on its own, without the per-minute quota
+        "REMINDER_MAX_PER_MINUTE": "1000000",
+        "REMINDER_DRAIN_INTERVAL": "86400",
+        "RECONCILE_MIN_INTERVAL": "0.5",
+        "RECONCILE_MAX_INTERVAL": "2",
+        "RECORDINGS_DIR": os.path.join(workdir, "recordings"),
+        "SUPABASE_URL": "",
+        "SUPABASE_KEY": "",
+        "PREANALYSIS_MODEL": "",
+    })
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(name: str, latencies: list, errors: int, elapsed: float) -> dict:
+    return {
+        "phase": name,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput": round((len(latencies) + errors) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "max_ms": round(max(latencies, default=0) * 1000, 1),
+    }
+
+
+class LoopProbe:
+    """Measures how late the event loop wakes a sleeping task; run on the loop under test."""
+
+    def __init__(self, stall: float):
+        self.stall = stall
+        self.samples = 0
+        self.stalls = 0
+        self.blocked = 0.0
+        self.max_lag = 0.0
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(EVENT_LOOP_PROBE)
+            lag = time.perf_counter() - start - EVENT_LOOP_PROBE
+            self.samples += 1
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.stall:
+                self.stalls += 1
+                self.blocked += lag
+
+    def report(self) -> dict:
+        return {"max_lag_ms": round(self.max_lag * 1000, 1), "blocked_ms": round(self.blocked * 1000, 1),
+                "stalls": self.stalls, "samples": self.samples}
+
+
+async def drive(client, count: int, concurrency: int, request):
+    """Issue `count` requests with `concurrency` workers; request(i) returns True on success."""
+    latencies, errors = [], 0
+    indexes = iter(range(count))
+
+    async def worker():
+        nonlocal errors
+        for i in indexes:
+            start = time.perf_counter()
+            try:
+                ok = await request(i)
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def contact(i: int) -> dict:
+    return {"name": f"Customer {i}", "phone": f"+9198{i:08d}", "bank_name": "Aindriya Bank", "voice": "female",
+            "tone": ("soft", "neutral", "firm")[i % 3], "due_amount": str(1000 + 250 * (i % 40)), "due_date": "2025-06-01"}
+
+
+def contact_sheet(rows: int, offset: int) -> str:
+    lines = ["name,phone,bank_name,voice,tone,due_amount,due_date"]
+    for i in range(offset, offset + rows):
+        c = contact(i)
+        lines.append(",".join(c[key] for key in ("name", "phone", "bank_name", "voice", "tone", "due_amount", "due_date")))
+    return "\n".join(lines) + "\n"
+
+
+async def wait_for(predicate, timeout: float, interval: float = 0.25) -> float:
+    start = time.perf_counter()
+    while not await predicate():
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError
+        await asyncio.sleep(interval)
+    return time.perf_counter() - start
+
+
+def stage_summary(telemetry) -> dict:
+    stages = {}
+    for metric in telemetry.stage_seconds.render():
+        if "_count{" in metric:
+            name = metric.split('stage="')[1].split('"')[0]
+            stages.setdefault(name, {})["count"] = int(metric.rsplit(" ", 1)[1])
+        elif "_sum{" in metric:
+            name = metric.split('stage="')[1].split('"')[0]
+            stages.setdefault(name, {})["sum"] = float(metric.rsplit(" ", 1)[1])
+    return {name: {"count": s["count"], "mean_ms": round(s["sum"] / s["count"] * 1000, 2)}
+            for name, s in stages.items() if s.get("count")}
+
+
+def serve_fakes(args, conn):
+    """
+    Child process: run the fake Bland server and SMTP sink, send back their
+    addresses, and send their stats once the parent asks.
+    """
+    from benchmarks.fakes import FakeBland, SMTPSink, ServerThread
+
+    bland = FakeBland(latency=args.bland_latency, error_rate=args.bland_error_rate, call_duration=args.call_duration)
+    smtp = SMTPSink(latency=args.smtp_latency, error_rate=args.smtp_error_rate)
+    conn.send((ServerThread(bland.app).start(), smtp.start()))
+    conn.recv()
+    conn.send({"bland": dict(bland.stats), "smtp": dict(smtp.stats)})
+
+
+async def _http_phases(args, base_url: str) -> dict:
+    import httpx
+
+    results = {"phases": []}
+    call_ids = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def start_call(i):
+            response = await client.post("/start-call/", json=contact(i))
+            call_id = response.json().get("call_id")
+            if call_id:
+                call_ids.append(call_id)
+            return response.status_code == 200 and call_id is not None
+
+        latencies, errors, elapsed = await drive(client, args.calls, args.concurrency, start_call)
+        results["phases"].append(summarize("start-call", latencies, errors, elapsed))
+
+        async def call_status(i):
+            response = await client.get(f"/call-status/{call_ids[i % len(call_ids)]}")
+            return response.status_code == 200 and "status" in response.json()
+
+        if call_ids and args.status_requests:
+            latencies, errors, elapsed = await drive(client, args.status_requests, args.concurrency, call_status)
+            results["phases"].append(summarize("call-status", latencies, errors, elapsed))
+
+        if args.upload_rows:
+            sheet = contact_sheet(args.upload_rows, offset=args.calls)
+            start = time.perf_counter()
+            response = await client.post("/upload-contacts/", files={"file": ("contacts.csv", sheet, "text/csv")})
+            accepted = time.perf_counter() - start
+            batch_id = response.json()["batch_id"]
+
+            async def batch_done():
+                return (await client.get(f"/batches/{batch_id}", params={"limit": 0})).json().get("done")
+
+            try:
+                elapsed = accepted + await wait_for(batch_done, args.timeout)
+            except TimeoutError:
+                elapsed = None
+            batch = (await client.get(f"/batches/{batch_id}", params={"limit": 0})).json()
+            results["upload"] = {
+                "rows": args.upload_rows, "accepted_ms": round(accepted * 1000, 1),
+                "dispatched": batch.get("dispatched"), "failed": batch.get("failed"),
+                "seconds": round(elapsed, 2) if elapsed else None,
+                "calls_per_second": round(batch.get("dispatched", 0) / elapsed, 1) if elapsed else None,
+            }
+    return results
+
+
+def http_phases(args, base_url: str) -> dict:
+    """Child process: the HTTP clients, kept off the app's GIL so they don't show up as loop lag."""
+    return asyncio.run(_http_phases(args, base_url))
+
+
+async def run(args, base_url: str, app_server, context) -> dict:
+    from concurrent.futures import ProcessPoolExecutor
+    from sqlalchemy import select, update, func
+    from app.db import engine, reminders as reminders_table
+    from app.services import pipeline, reminders, telemetry
+    from app.services.call_store import store
+    from app.services.analysis_queue import analysis_queue
+    from app.services.fake_gemini import FakeGenerativeModel
+
+    analysis_queue.model = FakeGenerativeModel(latency=args.gemini_latency, error_rate=args.gemini_error_rate)
+    # Measure the warm app, not the one-off library loads of WARM_UP_SERVICES
+    warm_up = getattr(app_server.config.app.state, "warm_up", None)
+    if warm_up is not None:
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(asyncio.wait([warm_up]), app_server.loop))
+    probe = LoopProbe(args.stall_ms / 1000)
+    probe_task = asyncio.run_coroutine_threadsafe(probe.run(), app_server.loop)
+
+    with ProcessPoolExecutor(1, mp_context=context) as executor:
+        results = await asyncio.get_running_loop().run_in_executor(executor, http_phases, args, base_url)
+    results["config"] = vars(args)
+
+    async def all_analyzed():
+        pending = await asyncio.to_thread(store.pending_calls, limit=1)
+        return not pending and not pipeline._inflight
+
+    try:
+        results["analysis_seconds"] = round(await wait_for(all_analyzed, args.timeout), 2)
+    except TimeoutError:
+        results["analysis_seconds"] = None
+
+    def make_reminders_due():
+        with engine.begin() as conn:
+            return conn.execute(update(reminders_table).where(reminders_table.c.status == "scheduled")
+                                .values(run_date=datetime.now())).rowcount
+
+    def count_sent():
+        with engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(reminders_table)
+                                .where(reminders_table.c.status == "sent")).scalar_one()
+
+    due = await asyncio.to_thread(make_reminders_due)
+    start = time.perf_counter()
+    await asyncio.to_thread(reminders.drain_due_reminders)
+    elapsed = time.perf_counter() - start
+    sent = await asyncio.to_thread(count_sent)
+    results["email"] = {"due": due, "sent": sent, "seconds": round(elapsed, 2),
+                        "per_second": round(sent / elapsed, 1) if elapsed else 0.0}
+
+    probe_task.cancel()
+    results["event_loop"] = probe.report()
+    results["stages"] = stage_summary(telemetry)
+    results["upstream"] = {"gemini_calls": analysis_queue.model.calls}
+    return results
+
+
+def print_report(results: dict):
+    print(f"{'phase':<14}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for p in results["phases"]:
+        print(f"{p['phase']:<14}{p['requests']:>9}{p['errors']:>8}{p['throughput']:>9}{p['p50_ms']:>9}{p['p99_ms']:>9}{p['max_ms']:>9}")
+    upload = results.get("upload")
+    if upload:
+        print(f"upload: {upload['rows']} rows accepted in {upload['accepted_ms']} ms; {upload['dispatched']} dialed, "
+              f"{upload['failed']} failed in {upload['seconds']} s ({upload['calls_per_second']} calls/s)")
+    print(f"analysis: every call ended and analyzed {results['analysis_seconds']} s after dialing finished")
+    email = results["email"]
+    print(f"email: {email['sent']}/{email['due']} reminders sent in {email['seconds']} s ({email['per_second']}/s)")
+    loop = results["event_loop"]
+    print(f"event loop: max lag {loop['max_lag_ms']} ms, {loop['blocked_ms']} ms blocked in {loop['stalls']} stalls")
+    print("stages: " + ", ".join(f"{name} {s['mean_ms']} ms x{s['count']}" for name, s in results["stages"].items()))
+    print(f"upstream: {results['upstream']}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Fakes and clients run in their own processes; forking after the app's
+    # threads start isn't safe, so spawn them
+    context = multiprocessing.get_context("spawn")
+    conn, child_conn = context.Pipe()
+    fakes = context.Process(target=serve_fakes, args=(args, child_conn), daemon=True)
+    fakes.start()
+
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        bland_url, smtp_port = conn.recv()
+        configure_env(args, workdir, bland_url, smtp_port)
+
+        from benchmarks.fakes import ServerThread
+        from app.main import app
+        app_server = ServerThread(app)
+        try:
+            base_url = app_server.start()
+            results = asyncio.run(run(args, base_url, app_server, context))
+            conn.send("stats")
+            results["upstream"].update(conn.recv())
+        finally:
+            app_server.stop()
+            fakes.terminate()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
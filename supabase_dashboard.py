@@ -4,6 +4,9 @@ import json
 import time
 from dotenv import load_dotenv
 from supabase import create_client
+from app.services.supabase_sink import SupabaseSink
+from app.services.reconciler import poll_delay, CALL_MAX_DURATION, RECONCILE_SLACK
+from app.services.recordings import download_recording
 from datetime import datetime
 
 # Load environment variables from .env
@@ -86,9 +89,11 @@ if not call_id:
 print(f"✅ Call initiated. Call ID: {call_id}")
 
 # ⏳ Poll until status becomes 'completed'
+# Same schedule as the server's reconciler: poll often while the call is young,
+# back off as it ages, and give up once it outlives its max_duration
 call_status = "unknown"
-max_wait_time = 180  # seconds
-poll_interval = 5
+max_wait_time = CALL_MAX_DURATION + RECONCILE_SLACK  # seconds
+started = time.monotonic()
 elapsed = 0
 
 while elapsed < max_wait_time:
@@ -104,8 +109,8 @@ while elapsed < max_wait_time:
     else:
         print("⚠️ Failed to fetch call details. Retrying...")
 
-    time.sleep(poll_interval)
-    elapsed += poll_interval
+    time.sleep(poll_delay(elapsed))
+    elapsed = int(time.monotonic() - started)
 else:
     print("❌ Timed out waiting for call to complete.")
     exit()
@@ -119,18 +124,12 @@ print(f"📁 Call details saved to {filename}")
 # 🔊 Download recording if available
 recording_url = details.get("recording_url")
 if recording_url:
-    try:
-        audio = requests.get(recording_url, headers=headers)  # Try with headers if needed
-        print(f"🧪 Download attempt status code: {audio.status_code}")
-        if audio.status_code == 200:
-            audio_file = f"call_recording_{call_id}.mp3"
-            with open(audio_file, 'wb') as f:
-                f.write(audio.content)
-            print(f"🎧 Recording saved to {audio_file}")
-        else:
-            print(f"⚠️ Failed to download recording. Status code: {audio.status_code}")
-    except Exception as e:
-        print(f"❌ Exception while downloading recording: {str(e)}")
+    # Streamed to the recordings cache; re-runs skip or resume the download
+    audio_file = download_recording(call_id, recording_url)
+    if audio_file:
+        print(f"🎧 Recording saved to {audio_file}")
+    else:
+        print("⚠️ Failed to download recording.")
 else:
     print("ℹ️ No recording URL found yet.")
 
@@ -144,5 +143,10 @@ data = {
   "created_at": datetime.utcnow().isoformat()  # Add timestamp
 }
 
-response = supabase.table("calls").insert(data).execute()
-print("✅ Call data saved to Supabase:", response)
+# Buffered, batched upsert (retries and spills to disk if Supabase is down)
+sink = SupabaseSink(client=supabase)
+sink.add(data)
+if sink.close():
+    print(f"⚠️ Supabase unavailable; call data kept in {sink.spill_path} for the next run")
+else:
+    print("✅ Call data saved to Supabase")
@@ -0,0 +1,48 @@
+"""AnalysisQueue packing, splitting and retries against the offline fake Gemini model."""
+import asyncio
+import pytest
+from app.utils import TokenBucket
+from app.services.analysis_queue import AnalysisQueue
+from app.services.fake_gemini import FakeGenerativeModel
+
+TRANSCRIPT = "assistant: Hello, this is a reminder about your overdue loan.\nuser: I will pay on Friday."
+
+
+def analyze_all(model, call_ids, **kwargs):
+    async def go():
+        queue = AnalysisQueue(model=model, workers=1, batch_wait=0.2, **kwargs)
+        # A local bucket; the shared one lives in the app database
+        queue.bucket = TokenBucket(1000, 10)
+        try:
+            results = await asyncio.gather(*(queue.analyze(call_id, TRANSCRIPT) for call_id in call_ids))
+        finally:
+            await queue.stop()
+        return dict(zip(call_ids, results)), queue.stats
+    return asyncio.run(go())
+
+
+def test_short_transcripts_are_packed_and_split_by_call_id():
+    model = FakeGenerativeModel()
+    results, stats = analyze_all(model, ["a", "b", "c"])
+    assert model.prompts == [["a", "b", "c"]]
+    assert stats["batched_requests"] == 1
+    # The fake answers out of order; each caller still gets its own call's analysis
+    for call_id, result in results.items():
+        assert result["summary"].startswith(f"Call {call_id}:")
+
+
+def test_calls_dropped_from_a_batch_are_retried_alone():
+    model = FakeGenerativeModel(drop=1)
+    results, stats = analyze_all(model, ["a", "b", "c"])
+    assert model.prompts == [["a", "b", "c"], []]
+    assert all(results.values())
+    assert stats["completed"] == 3 and stats["failed"] == 0
+
+
+@pytest.mark.parametrize("batch_size, expected", [(2, [["a", "b"], []]), (1, [[], [], []])])
+def test_batches_are_bounded(batch_size, expected):
+    model = FakeGenerativeModel()
+    results, _ = analyze_all(model, ["a", "b", "c"], batch_size=batch_size)
+    # A batch of one is sent as a single-transcript prompt
+    assert sorted(model.prompts) == sorted(expected)
+    assert all(results.values())
@@ -0,0 +1,82 @@
+"""
+BlandClient retry behaviour against a local stub of the Bland API
+(benchmarks.fakes.FakeBland served over real HTTP).
+"""
+import time
+import asyncio
+import httpx
+import pytest
+from app.services import bland
+from app.services.resilience import Provider
+from benchmarks.fakes import FakeBland, ServerThread
+
+MAX_RETRIES = 2
+
+
+@pytest.fixture
+def fake():
+    fake = FakeBland(latency=0, ring_time=0, call_duration=0, no_answer_rate=0)
+    server = ServerThread(fake.app)
+    fake.url = server.start()
+    yield fake
+    server.stop()
+
+
+@pytest.fixture(autouse=True)
+def provider(monkeypatch):
+    # A fresh breaker per test, so failures scripted in one test can't open it for the next
+    monkeypatch.setattr(bland, "bland_provider", Provider("bland", timeout=10, max_concurrency=10, failure_threshold=100))
+
+
+def run(fake, method: str, path: str, **kwargs) -> httpx.Response:
+    async def go():
+        client = bland.BlandClient(base_url=fake.url, timeout=0.5, max_retries=MAX_RETRIES, backoff=0.01)
+        try:
+            return await client.request(method, path, **kwargs)
+        finally:
+            await client.aclose()
+    return asyncio.run(go())
+
+
+def test_post_is_not_retried_after_read_timeout(fake):
+    fake.script("hang")
+    with pytest.raises(httpx.ReadTimeout):
+        run(fake, "POST", "/v1/calls", idempotent=False, json={"phone_number": "+919876543210"})
+    assert fake.stats["create"] == 1
+
+
+def test_get_is_retried_after_read_timeout(fake):
+    fake.script("hang")
+    response = run(fake, "GET", "/v1/calls/unknown")
+    assert response.status_code == 404
+    assert fake.stats["status"] == 2
+
+
+def test_429_is_retried_after_retry_after(fake):
+    fake.script((429, 1))
+    start = time.monotonic()
+    response = run(fake, "POST", "/v1/calls", idempotent=False, json={"phone_number": "+919876543210"})
+    assert response.status_code == 200
+    assert fake.stats["create"] == 2
+    assert time.monotonic() - start >= 1.0
+
+
+def test_5xx_is_retried_for_get(fake):
+    fake.script(503, 502)
+    response = run(fake, "GET", "/v1/calls/unknown")
+    assert response.status_code == 404
+    assert fake.stats["status"] == 3
+
+
+def test_5xx_is_not_retried_for_post(fake):
+    fake.script(503)
+    response = run(fake, "POST", "/v1/calls", idempotent=False, json={"phone_number": "+919876543210"})
+    assert response.status_code == 503
+    assert fake.stats["create"] == 1
+
+
+def test_attempts_are_bounded(fake):
+    fake.script(*[503] * 10)
+    response = run(fake, "GET", "/v1/calls/unknown")
+    assert response.status_code == 503
+    assert fake.stats["status"] == MAX_RETRIES + 1
@@ -0,0 +1,42 @@
+"""The SSE status stream against a throwaway SQLite call store."""
+import json
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, update
+from app.db import metadata, calls
+from app.services import events
+from app.services.call_store import SQLCallStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'calls.db'}")
+    metadata.create_all(engine)
+    store = SQLCallStore(engine)
+    monkeypatch.setattr(events, "store", store)
+    monkeypatch.setattr(events, "EVENTS_POLL_INTERVAL", 0.01)
+    return store
+
+
+def test_late_commit_with_an_earlier_timestamp_is_streamed(store):
+    store.upsert_calls([{"call_id": "call-1", "phone": "+919876543210", "name": "A", "status": "completed"}])
+
+    async def go():
+        stream = events.status_stream(call_ids=["call-1", "unplaced-2"])
+        first = await stream.__anext__()
+        # A row stamped before call-1 but committed after the stream read past it
+        store.upsert_calls([{"call_id": "unplaced-2", "phone": "+919876543211", "name": "B", "status": "error"}])
+        with store.engine.begin() as conn:
+            conn.execute(update(calls).where(calls.c.call_id == "unplaced-2")
+                         .values(updated_at=datetime.now() - timedelta(seconds=1)))
+        async def drain():
+            return [chunk async for chunk in stream]
+        # Without the row the stream never ends
+        return first, await asyncio.wait_for(drain(), 5)
+
+    first, rest = asyncio.run(go())
+    assert '"status": "completed"' in first
+    sent = [json.loads(line[6:]) for chunk in rest for line in chunk.splitlines() if line.startswith("data: ")]
+    assert {"call_id": None, "name": "B", "phone": "+919876543211", "status": "error"} in sent
+    assert "event: end" in rest[-1]
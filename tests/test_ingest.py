@@ -0,0 +1,29 @@
+"""Column-wise validation of uploaded sheets."""
+from datetime import datetime
+import pandas as pd
+import pytest
+from app.services.ingest import _dates, validate_chunk
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2025-06-15", "2025-06-15"),
+    (datetime(2025, 6, 5), "2025-06-05"),
+    ("05/06/2025", "2025-06-05"),
+    ("15-06-2025", "2025-06-15"),
+    # Invalid year-first dates are rejected rather than re-read day first
+    ("2025-13-01", ""),
+    ("2025/13/01", ""),
+    ("31/02/2025", ""),
+    ("", ""),
+    (None, ""),
+])
+def test_due_dates(value, expected):
+    assert _dates(pd.Series([value], dtype=object)).tolist() == [expected]
+
+
+def test_invalid_iso_due_date_rejects_the_row():
+    df = pd.DataFrame([{"name": "Ravi", "phone": "9876543210", "bank_name": "HDFC", "voice": "maya", "tone": "polite",
+                        "due_amount": "5000", "due_date": "2025-13-01"}])
+    valid, rejected = validate_chunk(df)
+    assert valid.empty
+    assert rejected[0]["row"] == 2 and any("due_date" in reason for reason in rejected[0]["reasons"])
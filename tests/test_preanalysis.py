@@ -0,0 +1,32 @@
+"""
+Local call classification: trivial calls are settled without Gemini, real
+conversations are not.
+"""
+import pytest
+from app.services.preanalysis import classify
+
+# The agent always speaks first (payloads set wait_for_greeting False)
+WRONG_NUMBER = ("assistant: Hello, am I speaking with the account holder?\n"
+                "user: Sorry, wrong number, there is no one by that name here.")
+VOICEMAIL = ("assistant: Hello, this is HDFC calling about your loan account.\n"
+             "user: Hi, you have reached Ravi. Please leave a message after the beep.")
+
+
+@pytest.mark.parametrize("transcript, kind", [
+    ("", "empty"),
+    (WRONG_NUMBER, "wrong_number"),
+    (VOICEMAIL, "voicemail"),
+    ("user: Hi, you have reached my voicemail. Please leave a message after the beep.", "voicemail"),
+    ("assistant: Hello, this is a reminder about your overdue loan.\nuser: Hello?", "no_response"),
+    # Phrases from the rules later in a real conversation
+    ("assistant: Hello, this is a reminder about your overdue loan.\n"
+     "user: Yes, I know. I could not pay because I was travelling.\n"
+     "assistant: We tried to reach you last week.\n"
+     "user: My phone was switched off, sorry about that. I will try to arrange the money soon.", "substantive"),
+    # A date always gets the full analysis
+    ("assistant: Hello, am I speaking with the account holder?\n"
+     "user: Wrong number? No, it's me, I'll pay tomorrow.", "substantive"),
+    ("assistant: Hello, this is a reminder about your overdue loan.\nuser: pay by 10/6", "substantive"),
+])
+def test_classify(transcript, kind):
+    assert classify(transcript) == kind
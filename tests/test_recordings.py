@@ -0,0 +1,29 @@
+"""Recording downloads for the same call never run at once."""
+import asyncio
+from app.services.recordings import RecordingFetcher
+
+
+def test_fetches_of_one_recording_are_serialized(tmp_path):
+    fetcher = RecordingFetcher(directory=str(tmp_path))
+    active, overlaps = set(), []
+
+    async def fake_fetch(call_id, url=None):
+        overlaps.append(len(active))
+        active.add(asyncio.current_task())
+        await asyncio.sleep(0.01)
+        active.discard(asyncio.current_task())
+        return call_id
+    fetcher._fetch = fake_fetch
+
+    async def go():
+        first = asyncio.create_task(fetcher.fetch("call-1"))
+        second = asyncio.create_task(fetcher.fetch("call-1"))
+        await first
+        # Arrives after the first fetch releases the lock but before the
+        # second one has woken up to take it
+        third = asyncio.create_task(fetcher.fetch("call-1"))
+        await asyncio.gather(second, third)
+
+    asyncio.run(go())
+    assert overlaps == [0, 0, 0]
+    assert fetcher._locks == {}
@@ -0,0 +1,106 @@
+"""
+SupabaseSink against a local PostgREST stub (benchmarks.fakes.FakeSupabase)
+through the real Supabase client.
+"""
+import json
+import time
+import pytest
+from supabase import create_client
+from app.services import supabase_sink
+from app.services.supabase_sink import SupabaseSink
+from benchmarks.fakes import FakeSupabase, ServerThread
+
+
+@pytest.fixture
+def fake():
+    fake = FakeSupabase()
+    server = ServerThread(fake.app)
+    fake.url = server.start()
+    yield fake
+    server.stop()
+
+
+@pytest.fixture
+def make_sink(fake, tmp_path, monkeypatch):
+    monkeypatch.setattr(supabase_sink, "SUPABASE_BACKOFF", 0.05)
+    monkeypatch.setattr(supabase_sink, "SUPABASE_MAX_RETRIES", 2)
+    sinks = []
+
+    def make(**kwargs):
+        client = create_client(fake.url, "test-key")
+        sink = SupabaseSink(client=client, spill_path=str(tmp_path / "spill.jsonl"), **kwargs)
+        sinks.append(sink)
+        return sink
+    yield make
+    for sink in sinks:
+        sink.close()
+
+
+def record(i: int, status: str = "completed") -> dict:
+    return {"call_id": f"call-{i}", "phone_number": "+919876543210", "status": status, "transcript": "",
+            "recording_url": None, "created_at": "2025-06-02T10:30:00"}
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_flushes_when_the_buffer_is_full(fake, make_sink):
+    sink = make_sink(batch_size=3, flush_interval=60)
+    sink.start()
+    for i in range(3):
+        sink.add(record(i))
+    wait_for(lambda: len(fake.tables.get("calls", {})) == 3)
+    assert fake.requests == [("calls", 3, 201)]
+
+
+def test_flushes_on_the_interval(fake, make_sink):
+    sink = make_sink(batch_size=100, flush_interval=0.2)
+    sink.start()
+    sink.add(record(1))
+    wait_for(lambda: "call-1" in fake.tables.get("calls", {}))
+
+
+def test_upserts_on_call_id(fake, make_sink):
+    sink = make_sink()
+    sink.add(record(1, "in-progress"))
+    sink.add(record(1, "completed"))
+    assert sink.flush() == 0
+    assert fake.tables["calls"]["call-1"]["status"] == "completed"
+
+
+def test_retries_with_backoff(fake, make_sink):
+    sink = make_sink()
+    fake.script(503, 503)
+    sink.add(record(1))
+    start = time.monotonic()
+    assert sink.flush() == 0
+    # Two failures wait 0.05 s, then 0.1 s
+    assert time.monotonic() - start >= 0.15
+    assert [status for _, _, status in fake.requests] == [503, 503, 201]
+    assert "call-1" in fake.tables["calls"]
+
+
+def test_spills_while_down_and_replays_after(fake, make_sink, monkeypatch):
+    monkeypatch.setattr(supabase_sink, "SUPABASE_RETRY_AFTER", 0.3)
+    sink = make_sink()
+    fake.down = True
+    sink.add(record(1))
+    assert sink.flush() == 1
+    assert len(fake.requests) == supabase_sink.SUPABASE_MAX_RETRIES + 1
+    # Until SUPABASE_RETRY_AFTER passes, records go straight to the spill file
+    sink.add(record(2))
+    assert sink.flush() == 1
+    assert len(fake.requests) == supabase_sink.SUPABASE_MAX_RETRIES + 1
+    with open(sink.spill_path) as f:
+        assert [json.loads(line)["call_id"] for line in f] == ["call-1", "call-2"]
+
+    fake.down = False
+    time.sleep(0.3)
+    sink.add(record(3))
+    assert sink.flush() == 0
+    assert set(fake.tables["calls"]) == {"call-1", "call-2", "call-3"}
+    assert fake.requests[-1] == ("calls", 3, 201)